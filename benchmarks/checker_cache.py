@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of per-request checker cost.
+
+Compares building a new `Checker` from settings on every validation (the way
+`RegistrationNameControlForm.clean_username` used to work) with the
+process-wide checker returned by `get_checker()`.
+
+Run from the repository root:
+
+    python benchmarks/checker_cache.py [--rules N] [--number N]
+"""
+from __future__ import print_function
+
+import optparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.normpath(
+    os.path.join(os.path.abspath(__file__), os.pardir, os.pardir)))
+
+from django.conf import settings
+
+from configs import make_config
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--rules', type='int', default=2000,
+                      help="Number of rules in the configuration.")
+    parser.add_option('--number', type='int', default=200,
+                      help="Number of checks to time.")
+    options, _ = parser.parse_args()
+
+    settings.configure(
+        REGISTRATION_NAMES=make_config('prohibited', options.rules))
+
+    from registration_names.checkers import Checker, get_checker
+
+    def uncached():
+        Checker(settings.REGISTRATION_NAMES).check('someone')
+
+    def cached():
+        get_checker().check('someone')
+
+    for name, func in (('uncached', uncached), ('cached', cached)):
+        elapsed = min(timeit.repeat(func, number=options.number, repeat=3))
+        print("{:10} {:12.1f} us/check".format(
+            name, elapsed / options.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
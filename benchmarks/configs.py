@@ -0,0 +1,60 @@
+"""
+Synthetic configurations and names for benchmarks.
+"""
+import random
+
+
+CONTROL_TYPES = ('allowed', 'prohibited', 'allowed_and_prohibited',
+                 'disabled')
+
+# Shares of literal names among rules. The rest are regexps, a half of them
+# literal prefixes.
+MIXES = {
+    'literals': 1.0,
+    'mixed': 0.9,
+    'regexps': 0.0,
+}
+
+
+def make_rules(size, literal_share, tag):
+    """
+    Make a list of `size` rules.
+    """
+    literals = int(size * literal_share)
+    rules = ['{}{}'.format(tag, i) for i in range(literals)]
+    for i in range(literals, size):
+        if i % 2:
+            rules.append(('re', 'i', '{}{}_.*'.format(tag, i)))
+        else:
+            rules.append(('re', '', '{}{}[0-9]+x'.format(tag, i)))
+    return rules
+
+
+def make_config(control_type, size, literal_share=0.5):
+    """
+    Make a configuration with `size` rules in each list.
+    """
+    return {
+        'control_type': control_type,
+        'allowed': make_rules(size, literal_share, 'user'),
+        'prohibited': make_rules(size, literal_share, 'user1'),
+    }
+
+
+def make_names(count, size, seed=0):
+    """
+    Make `count` names, some of them hit rules of a configuration with `size`
+    rules.
+    """
+    rnd = random.Random(seed)
+    names = []
+    for _ in range(count):
+        n = rnd.randrange(size * 2)
+        kind = rnd.random()
+        if kind < 0.4:
+            names.append('user{}'.format(n))
+        elif kind < 0.7:
+            names.append('user{}_name'.format(n))
+        else:
+            names.append('someone{}'.format(n))
+    return names
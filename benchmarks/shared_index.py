@@ -0,0 +1,140 @@
+"""
+Memory benchmark of the shared name index.
+
+Starts 1 and N worker processes, like web server workers, which build a
+checker for a prohibited list of names from a text file and check names.
+Reports the total proportional set size (PSS) of the workers above the size
+of workers with checks disabled, for names kept in memory by every worker
+and for names in the shared index ('shared_index' key). The index is written
+by the parent process before workers start, as a master process would do.
+
+Linux only. Run from the repository root:
+
+    python benchmarks/shared_index.py [--names N] [--workers N]
+"""
+from __future__ import division, print_function
+
+import io
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+
+sys.path.insert(0, os.path.normpath(
+    os.path.join(os.path.abspath(__file__), os.pardir, os.pardir)))
+
+from django.conf import settings
+
+from configs import make_names
+
+
+def pss_kb(pid):
+    """
+    Return the proportional set size of the process in KiB.
+    """
+    path = '/proc/{}/smaps_rollup'.format(pid)
+    if not os.path.exists(path):
+        # Linux < 4.14.
+        path = '/proc/{}/smaps'.format(pid)
+    total = 0
+    with open(path) as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                total += int(line.split()[1])
+    return total
+
+
+def _worker(root, names, ready, go):
+    from registration_names.checkers import Checker
+
+    try:
+        checker = Checker(root)
+        for name in names:
+            checker.check(name)
+    except Exception:
+        traceback.print_exc()
+        os._exit(1)
+    finally:
+        os.write(ready, b'x')
+    # Wait until the parent measures memory of all workers.
+    os.read(go, 1)
+    os._exit(0)
+
+
+def run_workers(root, workers, names):
+    """
+    Return the total PSS of `workers` processes with checkers built from
+    `root` in KiB.
+    """
+    ready_r, ready_w = os.pipe()
+    go_r, go_w = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(go_w)
+            _worker(root, names, ready_w, go_r)
+        pids.append(pid)
+
+    for _ in pids:
+        os.read(ready_r, 1)
+    total = sum(pss_kb(pid) for pid in pids)
+    os.write(go_w, b'x' * workers)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    for fd in (ready_r, ready_w, go_r, go_w):
+        os.close(fd)
+    return total
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--names', type='int', default=500000,
+                      help="Number of names in the list.")
+    parser.add_option('--workers', type='int', default=8,
+                      help="Number of workers to compare with one.")
+    parser.add_option('--checks', type='int', default=20000,
+                      help="Number of checks in every worker.")
+    options, _ = parser.parse_args()
+
+    settings.configure()
+    from registration_names.checkers import Checker
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        names_path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(names_path, 'w', encoding='utf-8') as f:
+            for i in range(options.names):
+                f.write(u'user{}\n'.format(i))
+        index_dir = os.path.join(tmp_dir, 'index')
+        os.mkdir(index_dir)
+
+        disabled = {'control_type': 'disabled'}
+        memory = {
+            'control_type': 'prohibited',
+            'prohibited': [('file', names_path)],
+        }
+        shared = dict(memory, shared_index=index_dir)
+        # Written once, workers map it.
+        Checker(shared)
+
+        names = make_names(options.checks, options.names)
+        print("{} names, {} checks per worker".format(
+            options.names, options.checks))
+        print("{:8} {:>8} {:>12} {:>12}".format(
+            'mode', 'workers', 'total MiB', 'MiB/worker'))
+        for workers in (1, options.workers):
+            base = run_workers(disabled, workers, names)
+            for mode, root in (('memory', memory), ('shared', shared)):
+                total = (run_workers(root, workers, names) - base) / 1024
+                print("{:8} {:8} {:12.1f} {:12.1f}".format(
+                    mode, workers, total, total / workers))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmarks of `Checker` and the checks of the registration form.
+
+For every control type, list size and mix of literals and regexps measures:
+* construction time and memory of `Checker`;
+* ops/sec and p50/p99 latency of `Checker.check`;
+* ops/sec and p50/p99 latency of `NameControlMixin.clean_username` of a
+form whose base `clean_username` (the uniqueness query to the database) is
+stubbed.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --compare results.json
+
+Results are stored as JSON, so runs of different versions can be compared.
+"""
+from __future__ import division, print_function
+
+import gc
+import json
+import optparse
+import os
+import platform
+import sys
+import time
+import timeit
+
+import django
+
+sys.path.insert(0, os.path.normpath(
+    os.path.join(os.path.abspath(__file__), os.pardir, os.pardir)))
+
+from django.conf import settings
+
+from configs import CONTROL_TYPES, MIXES, make_config, make_names
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2.
+    tracemalloc = None
+
+
+timer = timeit.default_timer
+
+
+def percentile(sorted_values, p):
+    """
+    Return the `p`-th percentile of sorted values.
+    """
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[index]
+
+
+def measure_construction(checker_class, root, repeat):
+    """
+    Return the best construction time in seconds and the memory allocated
+    for the checker in bytes (None if it can't be measured).
+    """
+    best = None
+    for _ in range(repeat):
+        started = timer()
+        checker_class(root)
+        elapsed = timer() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    memory = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        # Kept alive until it's measured.
+        checkers_alive = [checker_class(root)]
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del checkers_alive[:]
+    return best, memory
+
+
+def measure_calls(func, names):
+    """
+    Call `func` with every name and return ops/sec and latencies in
+    microseconds.
+    """
+    latencies = []
+    total_started = timer()
+    for name in names:
+        started = timer()
+        func(name)
+        latencies.append(timer() - started)
+    total = timer() - total_started
+
+    latencies.sort()
+    return {
+        'ops_per_sec': len(names) / total,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+    }
+
+
+class StubForm(object):
+    """
+    The base form with `clean_username` which doesn't query the database.
+    """
+
+    def clean_username(self):
+        return self.cleaned_data['username']
+
+
+def make_clean_username():
+    """
+    Return a function calling `NameControlMixin.clean_username` of a form
+    with a name, not allowed names included.
+    """
+    from django.core.exceptions import ValidationError
+    from registration_names.forms import NameControlMixin
+
+    class Form(NameControlMixin, StubForm):
+        pass
+
+    form = Form()
+
+    def clean_username(name):
+        form.cleaned_data = {'username': name}
+        try:
+            form.clean_username()
+        except ValidationError:
+            pass
+    return clean_username
+
+
+def run(sizes, names_count, repeat):
+    """
+    Run all benchmarks and return results by scenario names.
+    """
+    from registration_names import checkers
+
+    clean_username = make_clean_username()
+
+    results = {}
+    for control_type in CONTROL_TYPES:
+        for size in sizes:
+            for mix_name, literal_share in sorted(MIXES.items()):
+                scenario = '{}/{}/{}'.format(control_type, size, mix_name)
+                root = make_config(control_type, size, literal_share)
+                names = make_names(names_count, size)
+
+                construction, memory = measure_construction(
+                    checkers.Checker, root, repeat)
+                checker = checkers.Checker(root)
+
+                settings.REGISTRATION_NAMES = root
+                checkers.get_checker()
+
+                results[scenario] = {
+                    'construction_ms': construction * 1e3,
+                    'memory_bytes': memory,
+                    'check': measure_calls(checker.check, names),
+                    'form': measure_calls(clean_username, names),
+                }
+                print("{:45} construction {:9.2f} ms, check {:10.0f} ops/s, "
+                      "p99 {:7.2f} us".format(
+                          scenario, construction * 1e3,
+                          results[scenario]['check']['ops_per_sec'],
+                          results[scenario]['check']['p99_us']))
+    return results
+
+
+def compare(results, baseline):
+    """
+    Print the ratios of results to the baseline results.
+    """
+    print()
+    print("{:45} {:>12} {:>12} {:>12}".format(
+        "Compared to baseline", "construction", "check ops/s", "check p99"))
+    for scenario in sorted(results):
+        if scenario not in baseline:
+            continue
+        new = results[scenario]
+        old = baseline[scenario]
+        print("{:45} {:11.2f}x {:11.2f}x {:11.2f}x".format(
+            scenario,
+            new['construction_ms'] / max(old['construction_ms'], 1e-9),
+            new['check']['ops_per_sec'] /
+            max(old['check']['ops_per_sec'], 1e-9),
+            new['check']['p99_us'] / max(old['check']['p99_us'], 1e-9)))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--sizes', default='10,1000,10000',
+                      help="Comma-separated numbers of rules in each list.")
+    parser.add_option('--names', type='int', default=20000,
+                      help="Number of names to check in every scenario.")
+    parser.add_option('--repeat', type='int', default=3,
+                      help="Number of constructions to time.")
+    parser.add_option('--output', help="File to store results to.")
+    parser.add_option('--compare', help="File with results to compare with.")
+    options, _ = parser.parse_args()
+
+    settings.configure(
+        REGISTRATION_NAMES=None,
+        # Needed by the forms of django-registration.
+        INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes'])
+    if hasattr(django, 'setup'):
+        # Django >= 1.7.
+        django.setup()
+
+    sizes = [int(s) for s in options.sizes.split(',')]
+    results = run(sizes, options.names, options.repeat)
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(results, json.load(f)['results'])
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'sizes': sizes,
+                'names': options.names,
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from registration_names.models import ReservedName
+
+
+class ReservedNameAdmin(admin.ModelAdmin):
+    list_display = ('pattern', 'list_name', 'kind', 'flags')
+    list_filter = ('list_name', 'kind')
+    search_fields = ('pattern',)
+
+
+admin.site.register(ReservedName, ReservedNameAdmin)
@@ -1,14 +1,16 @@
 from registration.backends.default import DefaultBackend as StdDefaultBackend
 
 from registration_names.forms import RegistrationNameControlForm
+from registration_names.sites import get_form_class
 
 
 class DefaultBackend(StdDefaultBackend):
     """
     A registration backend which inherited from django-registration
     `DefaultBackend` and replaces the registration form with
-    `RegistrationNameControlForm`.
+    `RegistrationNameControlForm` checking names with the rules of the
+    request's site (see `registration_names.sites`).
     """
 
     def get_form_class(self, request):
-        return RegistrationNameControlForm
\ No newline at end of file
+        return get_form_class(RegistrationNameControlForm, request)
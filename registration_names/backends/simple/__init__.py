@@ -1,14 +1,16 @@
 from registration.backends.simple import SimpleBackend as StdSimpleBackend
 
 from registration_names.forms import RegistrationNameControlForm
+from registration_names.sites import get_form_class
 
 
 class SimpleBackend(StdSimpleBackend):
     """
     A registration backend which inherited from django-registration
     `SimpleBackend` and replaces the registration form with
-    `RegistrationNameControlForm`.
+    `RegistrationNameControlForm` checking names with the rules of the
+    request's site (see `registration_names.sites`).
     """
     
     def get_form_class(self, request):
-        return RegistrationNameControlForm
\ No newline at end of file
+        return get_form_class(RegistrationNameControlForm, request)
@@ -1,14 +1,22 @@
 """
 URLconf which uses django-registration's one but changes backend argument
 to `registration_names.backends.simple.SimpleBackend`.
+
+Also adds the username availability check.
 """
 
 
 from __future__ import absolute_import
+from django.conf.urls import url
 from registration.backends.default.urls import urlpatterns as std_urlpatterns
 
+from registration_names.views import check_username
+
 from ..utils import transform_registration_patters
 
 
 urlpatterns = transform_registration_patters(std_urlpatterns,
     'registration_names.backends.simple.SimpleBackend')
+urlpatterns.append(
+    url(r'^check-username/$', check_username,
+        name='registration_names_check_username'))
@@ -1,6 +1,19 @@
 from copy import deepcopy
-from django.core.urlresolvers import RegexURLPattern
+from django.core.exceptions import ImproperlyConfigured
+from django.core.urlresolvers import (
+    RegexURLPattern, RegexURLResolver, get_resolver)
 from django.conf.urls import url
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from registration_names.checkers import URLS_KEY
+
+
+# Characters which end the literal part of a regexp pattern.
+_META_CHARS = frozenset('.^$*+?{}[]|()')
+
+# Names of the first path segments of the root URLconf, see `get_url_names`.
+_url_names = None
 
 
 def transform_registration_patters(patterns, new_backend):
@@ -21,4 +34,103 @@ def transform_registration_patters(patterns, new_backend):
         new_default_args['backend'] = new_backend        
         result.append(
             url(p.regex.pattern, p.callback, new_default_args, p.name))
-    return result
\ No newline at end of file
+    return result
+
+
+def _first_segment(pattern):
+    """
+    Return the literal first path segment matched by a URL regexp pattern,
+    an empty string for patterns which match any path without consuming
+    it (e.g. '^') or None if the segment isn't literal.
+    """
+    if not pattern.startswith('^'):
+        # Unanchored patterns may match anywhere in the path.
+        return '' if pattern == '' else None
+    pattern = pattern[1:]
+    chars = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '/':
+            break
+        if c == '\\':
+            # '\\d', '\\w' and so on are character classes, not literals.
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                return None
+            chars.append(pattern[i + 1])
+            i += 2
+            continue
+        if c in _META_CHARS:
+            if pattern[i:] != '$':
+                return None
+            break
+        chars.append(c)
+        i += 1
+    return ''.join(chars)
+
+
+def url_first_segments(patterns):
+    """
+    Return literal first path segments of URL patterns, e.g. 'login' for
+    '^login/$' and 'accounts' for '^accounts/' include.
+
+    Resolvers which don't consume a segment are walked into.
+    """
+    result = []
+    for p in patterns:
+        segment = _first_segment(p.regex.pattern)
+        if segment:
+            result.append(segment)
+        elif segment == '' and isinstance(p, RegexURLResolver):
+            result.extend(url_first_segments(p.url_patterns))
+    return result
+
+
+def get_url_names():
+    """
+    Return the sorted list of distinct literal first path segments of the
+    root URLconf.
+
+    The URLconf is walked once per process.
+    """
+    global _url_names
+
+    if _url_names is None:
+        _url_names = sorted(set(
+            url_first_segments(get_resolver(None).url_patterns)))
+    return _url_names
+
+
+def add_url_names(root):
+    """
+    Return a copy of the configuration dictionary with the first path
+    segments of the root URLconf (see `get_url_names`) added to 'prohibited'
+    list.
+
+    Raises ImproperlyConfigured if 'prohibited' list isn't checked with the
+    control type of the configuration, the names would be ignored.
+    """
+    control_type = root.get('control_type')
+    if control_type in ('allowed', 'disabled'):
+        raise ImproperlyConfigured(
+            "'{}' needs 'control_type' set to 'prohibited' or "
+            "'allowed_and_prohibited'. '{}' given.".format(
+                URLS_KEY, control_type))
+
+    root = dict(root)
+    current = root.get('prohibited', [])
+    # Leave incorrect values for the checker to report.
+    if isinstance(current, (list, tuple)):
+        root['prohibited'] = list(current) + get_url_names()
+    return root
+
+
+@receiver(setting_changed)
+def _reset_url_names(sender, setting, **kwargs):
+    """
+    Drop the cached names when `ROOT_URLCONF` setting changes.
+    """
+    global _url_names
+
+    if setting == 'ROOT_URLCONF':
+        _url_names = None
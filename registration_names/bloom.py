@@ -0,0 +1,88 @@
+"""
+Bloom filters of names.
+
+A Bloom filter tells that a name is definitely not in a set or may be in it
+with a given false-positive rate, in about 1.2 bytes per name for 1%. Names
+files keep one in front of the sorted names, so most names which aren't in
+the file are rejected without binary search over the file.
+"""
+import hashlib
+import math
+import struct
+
+from django.utils import six
+
+
+_HASHES = struct.Struct('<QQ')
+_BYTE = struct.Struct('B')
+
+
+def filter_size(count, error_rate):
+    """
+    Return the tuple of the number of bits and the number of hash functions
+    of the filter for `count` names with the false-positive rate `error_rate`.
+    """
+    if not 0 < error_rate < 1:
+        raise ValueError(
+            "The error rate must be between 0 and 1, {} given.".format(
+                error_rate))
+    count = max(count, 1)
+    bits = int(math.ceil(-count * math.log(error_rate) / math.log(2) ** 2))
+    # Whole bytes.
+    bits = (bits + 7) // 8 * 8
+    hashes = max(1, int(round(float(bits) / count * math.log(2))))
+    return bits, hashes
+
+
+def _positions(value, bits, hashes):
+    # Double hashing: positions are h1 + i * h2 for i in range(hashes).
+    if isinstance(value, six.text_type):
+        value = value.encode('utf-8')
+    h1, h2 = _HASHES.unpack(hashlib.md5(value).digest())
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+class BloomFilter(object):
+    """
+    Bloom filter over a bytes-like buffer.
+
+    `buffer` - a bytearray or a memory mapped file (read-only filters).
+    `offset` - the offset of the filter in the buffer.
+    `bits` and `hashes` - as returned by `filter_size`.
+    """
+
+    def __init__(self, buffer, offset, bits, hashes):
+        self.__buffer = buffer
+        self.__offset = offset
+        self.bits = bits
+        self.hashes = hashes
+
+    @classmethod
+    def build(cls, names, error_rate):
+        """
+        Make the filter of a sequence of names in memory.
+        """
+        bits, hashes = filter_size(len(names), error_rate)
+        result = cls(bytearray(bits // 8), 0, bits, hashes)
+        for name in names:
+            result.add(name)
+        return result
+
+    def as_bytes(self):
+        return bytes(self.__buffer[self.__offset:self.__offset +
+                                   self.bits // 8])
+
+    def add(self, value):
+        buf = self.__buffer
+        for i in _positions(value, self.bits, self.hashes):
+            buf[self.__offset + (i >> 3)] |= 1 << (i & 7)
+
+    def __contains__(self, value):
+        buf = self.__buffer
+        offset = self.__offset
+        for i in _positions(value, self.bits, self.hashes):
+            if not _BYTE.unpack_from(buf, offset + (i >> 3))[0] & \
+                    (1 << (i & 7)):
+                return False
+        return True
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Canonical forms of names.
+
+Names which look alike are reduced to the same canonical form: the name is
+normalized with NFKC, case folded and characters confusable with Latin
+letters are replaced with these letters (a subset of Unicode TR39 skeleton
+mappings for Cyrillic, Greek and digits).
+"""
+import unicodedata
+
+from django.utils import six
+
+
+_casefold = getattr(six.text_type, 'casefold', six.text_type.lower)
+
+# Characters (after case folding) and the Latin letters they may be confused
+# with.
+CONFUSABLES = {
+    # Cyrillic.
+    u'а': u'a', u'в': u'b', u'е': u'e', u'ё': u'e', u'һ': u'h', u'і': u'i',
+    u'ї': u'i', u'ј': u'j', u'к': u'k', u'ӏ': u'l', u'м': u'm', u'о': u'o',
+    u'р': u'p', u'ԛ': u'q', u'ѕ': u's', u'т': u't', u'с': u'c', u'у': u'y',
+    u'ԝ': u'w', u'х': u'x', u'ԁ': u'd', u'ɡ': u'g', u'ү': u'y',
+    # Greek.
+    u'α': u'a', u'β': u'b', u'ϲ': u'c', u'ε': u'e', u'η': u'n', u'ι': u'i',
+    u'κ': u'k', u'ν': u'v', u'ο': u'o', u'ρ': u'p', u'τ': u't', u'υ': u'u',
+    u'χ': u'x', u'γ': u'y', u'ω': u'w',
+    # Latin.
+    u'ı': u'i', u'ȷ': u'j', u'ʟ': u'l', u'ɪ': u'i', u'ʀ': u'r',
+    # Digits.
+    u'0': u'o', u'1': u'l',
+}
+
+_CONFUSABLES_TABLE = dict((ord(k), v) for k, v in CONFUSABLES.items())
+
+
+def canonicalize(value):
+    """
+    Return the canonical form of `value`.
+    """
+    value = unicodedata.normalize('NFKC', six.text_type(value))
+    value = unicodedata.normalize('NFKC', _casefold(value))
+    return value.translate(_CONFUSABLES_TABLE)
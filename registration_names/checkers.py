@@ -1,11 +1,997 @@
+# -*- coding: utf-8 -*-
 """
 Usersnames checkers.
 """
+import collections
+import errno
+import hashlib
+import itertools
+import os
 import re
+import threading
+import time
+import timeit
+import warnings
 
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import six
 
+from registration_names import namefiles
+from registration_names.canonical import canonicalize
+from registration_names.signals import name_checked
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    # Python < 3.11.
+    import sre_parse
+
+
+ROOT_CONFIG = 'REGISTRATION_NAMES'
+SNAPSHOT_CONFIG = 'REGISTRATION_NAMES_SNAPSHOT'
+DATABASE_KEY = 'database'
+URLS_KEY = 'prohibit_urls'
+
+# Regexp patterns which can't be safely joined into an alternation with
+# others: backreferences and conditionals depend on group numbers, inline flags
+# apply to the whole expression.
+_UNCOMBINABLE_RE = re.compile(r'\\[1-9]|\(\?\(|\(\?[aiLmsux]')
+
+# Characters with special meaning in regexps.
+_META_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+# Serializes changes of checkers' lists, see `Checker.apply_diff`.
+_update_lock = threading.Lock()
+
+# Monotonic time in nanoseconds.
+_timer_ns = getattr(time, 'perf_counter_ns', None) or (
+    lambda: int(timeit.default_timer() * 1e9))
+
+
+def _is_ascii(value):
+    """
+    Determine if `value` consists of ASCII characters only.
+    """
+    try:
+        value.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+
+def _literal_prefix(pattern):
+    """
+    Return the literal prefix a regexp pattern checks values to start with.
+
+    Only plain literals (with escaped special characters) optionally followed
+    by '.*' are recognized, since `re.match` anchors them at the start of a
+    value only. Returns None for other patterns.
+    """
+    chars = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            # '\\d', '\\w' and so on are character classes, not literals.
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                return None
+            chars.append(pattern[i + 1])
+            i += 2
+        elif c in _META_CHARS:
+            if pattern[i:] in ('.*', '.*?'):
+                break
+            return None
+        else:
+            chars.append(c)
+            i += 1
+    return ''.join(chars)
+
+
+# Repeats with greater maximum are considered unbounded by the regexp safety
+# analysis.
+_LARGE_REPEAT = 10
+
+
+def _has_nested_quantifiers(pattern, flags):
+    """
+    Determine if the regexp repeats a subpattern which itself contains an
+    unbounded repeat, e.g. '(a+)+'. Matching such regexps may take
+    exponential time because of backtracking.
+    """
+    repeats = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+    def walk(subpattern, in_repeat):
+        for op, av in subpattern:
+            if op in repeats:
+                large = (av[1] == sre_parse.MAXREPEAT or
+                         av[1] > _LARGE_REPEAT)
+                if large and in_repeat:
+                    return True
+                if walk(av[2], in_repeat or large):
+                    return True
+            else:
+                for child in children(av):
+                    if walk(child, in_repeat):
+                        return True
+        return False
+
+    def children(av):
+        # Subpatterns of groups, branches, lookarounds and so on.
+        if isinstance(av, sre_parse.SubPattern):
+            yield av
+        elif isinstance(av, (list, tuple)):
+            for item in av:
+                for child in children(item):
+                    yield child
+
+    return walk(sre_parse.parse(pattern, flags), False)
+
+
+class _LazyRegexp(object):
+    """
+    Regexp compiled on first use.
+
+    Used for source regexps of unpickled checkers, which are only needed for
+    finding the matching rule and explaining.
+    """
+
+    def __init__(self, pattern, flags):
+        self.pattern = pattern
+        self.flags = flags
+        self.__regexp = None
+
+    def __reduce__(self):
+        return (_LazyRegexp, (self.pattern, self.flags))
+
+    def __compiled(self):
+        if self.__regexp is None:
+            self.__regexp = re.compile(self.pattern, self.flags)
+        return self.__regexp
+
+    @property
+    def groupindex(self):
+        return self.__compiled().groupindex
+
+    def match(self, value):
+        return self.__compiled().match(value)
+
+
+def _lazy_sources(matchers):
+    """
+    Replace source regexps of joined regexps with lazy ones for pickling.
+
+    `matchers` - the list of regexps as returned by `_combine_patterns`.
+    """
+    result = []
+    for r, patterns in matchers:
+        if len(patterns) > 1:
+            patterns = [(_LazyRegexp(pr.pattern, pr.flags), rule, n)
+                        for pr, rule, n in patterns]
+        result.append((r, patterns))
+    return result
+
+
+def _combine_patterns(patterns):
+    """
+    Join compiled regexps into as few regexps as possible.
+
+    Patterns with the same flags are joined into one alternation, so a value
+    is matched against all of them in a single call. Patterns which can't be
+    joined safely are left as is.
+
+    `patterns` - the list of `(regexp, rule)` tuples in the order of the
+    list, where `rule` is the list element the regexp is compiled from.
+
+    Returns the list of `(regexp, patterns)` tuples ordered by the first
+    source regexp, where `patterns` are the source `(regexp, rule, n)`
+    tuples of the regexp and `n` is the position in `patterns`.
+    """
+    result = []
+    by_flags = {}
+    for n, (r, rule) in enumerate(patterns):
+        if r.groupindex or _UNCOMBINABLE_RE.search(r.pattern):
+            result.append((r, [(r, rule, n)]))
+        else:
+            by_flags.setdefault(r.flags, []).append((r, rule, n))
+
+    for flags, group in by_flags.items():
+        if len(group) == 1:
+            result.append((group[0][0], group))
+            continue
+        pattern = '|'.join(['(?:' + r.pattern + ')' for r, _, _ in group])
+        try:
+            result.append((re.compile(pattern, flags), group))
+        except (re.error, AssertionError, OverflowError, RuntimeError):
+            # E.g. too many groups for the regexp engine.
+            result.extend([(r, [(r, rule, n)]) for r, rule, n in group])
+    result.sort(key=lambda matcher: matcher[1][0][2])
+    return result
+
+
+def _match_rule(matchers, value):
+    """
+    Return the rule of the first regexp in the order of the list matching
+    `value` or None.
+
+    `matchers` - the list of regexps as returned by `_combine_patterns`.
+    """
+    found = None
+    for r, patterns in matchers:
+        # Matchers are ordered by their first regexps, regexps after the
+        # found one needn't be matched.
+        if found is not None and patterns[0][2] > found[0]:
+            break
+        if not r.match(value):
+            continue
+        if len(patterns) == 1:
+            found = (patterns[0][2], patterns[0][1])
+            continue
+        for pr, rule, n in patterns:
+            if found is not None and n > found[0]:
+                break
+            if pr.match(value):
+                found = (n, rule)
+                break
+    return found[1] if found is not None else None
+
+
+def _find_prefix(prefixes, lengths, value):
+    """
+    Return the rule of a prefix `value` starts with or None.
+
+    `prefixes` - the dictionary of prefixes and their rules.
+    `lengths` - the sorted list of distinct lengths of the prefixes.
+    """
+    for n in lengths:
+        if n > len(value):
+            break
+        rule = prefixes.get(value[:n])
+        if rule is not None:
+            return rule
+    return None
+
+
+# The maximum edit distance of 'near' rules, the index grows as
+# len(name) ** distance.
+_MAX_NEAR_DISTANCE = 3
+
+
+def _deletions(value, distance):
+    """
+    Return the set of strings made by deleting up to `distance` characters
+    from `value`, including `value` itself.
+    """
+    result = set([value])
+    level = [value]
+    for _ in range(distance):
+        next_level = []
+        for v in level:
+            for i in range(len(v)):
+                d = v[:i] + v[i + 1:]
+                if d not in result:
+                    result.add(d)
+                    next_level.append(d)
+        level = next_level
+    return result
+
+
+def _edit_distance(a, b, max_distance):
+    """
+    Return the Levenshtein distance between `a` and `b` or `max_distance + 1`
+    if it's greater than `max_distance`.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+
+class _NearIndex(object):
+    """
+    Symmetric deletion index of 'near' rules.
+
+    Every name is indexed by all strings made by deleting up to its distance
+    of characters. Names within the distance of a value share at least one
+    such string with the value's deletions, so only these names are compared
+    with the value.
+    """
+
+    def __init__(self, entries):
+        """
+        Constructor.
+
+        `entries` - the list of `(distance, name, rule)` tuples.
+        """
+        self.__index = {}
+        self.__max_distance = 0
+        # Longer values are farther than the distance from every name.
+        self.__max_length = 0
+        for distance, name, rule in entries:
+            self.__max_distance = max(self.__max_distance, distance)
+            self.__max_length = max(self.__max_length, len(name) + distance)
+            for d in _deletions(name, distance):
+                self.__index.setdefault(d, []).append((distance, name, rule))
+
+    def __bool__(self):
+        return bool(self.__index)
+
+    __nonzero__ = __bool__
+
+    def find(self, value):
+        """
+        Return the rule of the first name within its distance of `value` or
+        None.
+        """
+        if len(value) > self.__max_length:
+            return None
+        index = self.__index
+        for d in _deletions(value, self.__max_distance):
+            for distance, name, rule in index.get(d, ()):
+                if _edit_distance(value, name, distance) <= distance:
+                    return rule
+        return None
+
+
+class _Automaton(object):
+    """
+    Aho-Corasick automaton of substrings.
+
+    Finds if a value contains any of the substrings in a single pass over the
+    value.
+    """
+
+    def __init__(self, entries):
+        """
+        Constructor.
+
+        `entries` - the list of `(substring, rule)` tuples.
+        """
+        # Transitions, failure links and the first rule ending in the state
+        # (directly or by failure links) by states.
+        self.__goto = [{}]
+        self.__fail = [0]
+        self.__out = [None]
+
+        for substring, rule in entries:
+            state = 0
+            for c in substring:
+                next_state = self.__goto[state].get(c)
+                if next_state is None:
+                    next_state = len(self.__goto)
+                    self.__goto[state][c] = next_state
+                    self.__goto.append({})
+                    self.__fail.append(0)
+                    self.__out.append(None)
+                state = next_state
+            if self.__out[state] is None:
+                self.__out[state] = rule
+
+        # Breadth-first, so failure links point to already processed states.
+        queue = collections.deque(self.__goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self.__goto[state].items():
+                queue.append(next_state)
+                fail = self.__fail[state]
+                while fail and c not in self.__goto[fail]:
+                    fail = self.__fail[fail]
+                fail = self.__goto[fail].get(c, 0)
+                if fail == next_state:
+                    fail = 0
+                self.__fail[next_state] = fail
+                if self.__out[next_state] is None:
+                    self.__out[next_state] = self.__out[fail]
+
+    def __bool__(self):
+        return len(self.__goto) > 1
+
+    __nonzero__ = __bool__
+
+    def find(self, value):
+        """
+        Return the rule of the first substring found in `value` or None.
+        """
+        goto = self.__goto
+        fail = self.__fail
+        out = self.__out
+        state = 0
+        for c in value:
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+
+# The false-positive rate of Bloom filters of shared name files.
+_SHARED_ERROR_RATE = 0.01
+
+
+def _shared_text_path(directory, path, canonical):
+    """
+    Return the path of the shared name file of the text file `path` in
+    `directory`.
+
+    Files are named by the digest of the absolute path of the text file and
+    the digest of its size and modification time, so processes building
+    checkers with the same file map the same shared file and a changed file
+    gets a new one.
+    """
+    st = os.stat(path)
+    group = hashlib.sha1(repr((os.path.abspath(path), bool(canonical)))
+                         .encode('utf-8')).hexdigest()
+    version = hashlib.sha1(repr((st.st_mtime, st.st_size))
+                           .encode('utf-8')).hexdigest()
+    return os.path.join(directory, 'text-{}-{}.bin'.format(group, version))
+
+
+def _remove_older_files(directory, group, path):
+    """
+    Remove shared name files of the group `group` (the same text file) in
+    `directory` older than the file `path` which replaces them.
+
+    Processes which have mapped the removed files keep using them.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+        file_names = os.listdir(directory)
+    except OSError:
+        return
+    for file_name in file_names:
+        parts = file_name.split('-')
+        if (len(parts) != 3 or parts[0] != 'text' or parts[1] != group or
+                not parts[2].endswith('.bin')):
+            continue
+        other = os.path.join(directory, file_name)
+        try:
+            if other != path and os.stat(other).st_mtime < mtime:
+                os.remove(other)
+        except OSError:
+            # Removed by another process or mapped (on Windows).
+            pass
+
+
+def _write_shared_file(path, names):
+    namefiles.write_sorted_names(names, path, _SHARED_ERROR_RATE)
+    _remove_older_files(os.path.dirname(path),
+                        os.path.basename(path).split('-')[1], path)
+
+
+def _shared_names_file(path, names):
+    """
+    Return the memory mapped shared name file `path`, writing it first unless
+    another process has already written it.
+
+    `names` - a callable returning the names of the file, it's called only
+    when the file is written.
+
+    The file is written again when it's removed before it's mapped (as an
+    older file by another process), so it's never written without names.
+    """
+    if not os.path.exists(path):
+        _write_shared_file(path, names())
+    try:
+        return namefiles.SortedNameFile(path)
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise
+    _write_shared_file(path, names())
+    return namefiles.SortedNameFile(path)
+
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'size', 'max_size'])
+
+
+class _LRUCache(object):
+    """
+    Bounded cache of check results which evicts least recently used ones.
+    """
+
+    def __init__(self, max_size):
+        self.__max_size = max_size
+        self.__data = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __reduce__(self):
+        # Pickled empty.
+        return (_LRUCache, (self.__max_size,))
+
+    def get(self, key):
+        """
+        Return the cached result or None.
+        """
+        with self.__lock:
+            try:
+                result = self.__data.pop(key)
+            except KeyError:
+                self.__misses += 1
+                return None
+            # Move to the most recently used end.
+            self.__data[key] = result
+            self.__hits += 1
+            return result
+
+    def set(self, key, result):
+        with self.__lock:
+            self.__data[key] = result
+            if len(self.__data) > self.__max_size:
+                self.__data.popitem(last=False)
+                self.__evictions += 1
+
+    def info(self):
+        with self.__lock:
+            return CacheInfo(self.__hits, self.__misses, self.__evictions,
+                             len(self.__data), self.__max_size)
+
+
+class _Stats(object):
+    """
+    Instrumentation statistics of a checker.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__checks = 0
+        self.__total_ns = 0
+        self.__max_ns = 0
+        self.__rules = {}
+
+    def __reduce__(self):
+        # Pickled empty.
+        return (_Stats, ())
+
+    def add(self, list_name, rule_index, elapsed_ns):
+        with self.__lock:
+            self.__checks += 1
+            self.__total_ns += elapsed_ns
+            if elapsed_ns > self.__max_ns:
+                self.__max_ns = elapsed_ns
+            if rule_index is not None:
+                key = (list_name, rule_index)
+                self.__rules[key] = self.__rules.get(key, 0) + 1
+
+    def as_dict(self):
+        with self.__lock:
+            return {
+                'checks': self.__checks,
+                'total_ns': self.__total_ns,
+                'max_ns': self.__max_ns,
+                'rules': dict(self.__rules),
+            }
+
+
+class _RuleList(object):
+    """
+    Compiled 'allowed' or 'prohibited' list.
+
+    Names are kept in a frozenset and literal prefixes in dictionaries looked
+    up by every distinct prefix length, so only the remaining regexps are
+    matched one by one. Elements of text files keep their names too, so
+    text files are never read again once the list is built.
+
+    In canonical lists names (including names in files) are compared by their
+    canonical forms, see `registration_names.canonical`.
+
+    With a shared index directory names of text files are kept in memory
+    mapped files instead of the frozenset, so processes share one copy of
+    them.
+
+    Lists are never changed in place, `updated` makes a changed copy.
+    """
+
+    def __init__(self, parsed, canonical=False):
+        """
+        Constructor.
+
+        `parsed` - the list of `(type, value, element)` tuples of parsed list
+        elements, where `type` and `value` are as returned by
+        `Checker.__parse_list_element` and `element` is the list element
+        itself.
+        `canonical` - whether names are compared by their canonical forms.
+        """
+        self.__canonical = canonical
+        # Parsed elements by positions, removed ones are None.
+        self.__parsed = list(parsed)
+        self.__positions = None
+
+        strings = []
+        for t, v, _ in parsed:
+            if t == 'str':
+                strings.append(v)
+            elif t == 'names':
+                strings.extend(v)
+        self.__set_strings(strings)
+
+        self.__set_shared()
+        self.__set_files()
+        self.__set_prefixes()
+        self.__set_patterns()
+        self.__set_near()
+        self.__set_contains()
+
+    def __set_strings(self, strings):
+        if self.__canonical:
+            # Canonical forms and the names they come from.
+            self.__strings = {}
+            for s in strings:
+                self.__strings.setdefault(canonicalize(s), s)
+        else:
+            self.__strings = frozenset(strings)
+
+    def __find_name(self, key):
+        """
+        Return the name of the list which is `key` or has the canonical form
+        `key` or None.
+
+        Names from shared files are returned as their keys.
+        """
+        if self.__canonical:
+            name = self.__strings.get(key)
+        else:
+            name = key if key in self.__strings else None
+        if name is None and self.__in_shared(key):
+            return key
+        return name
+
+    def __in_shared(self, key):
+        for f in self.__shared:
+            if key in f:
+                return True
+        return False
+
+    def __set_shared(self):
+        # Shared name files of text files, they hold canonical forms in
+        # canonical lists.
+        self.__shared = [v for t, v, _ in self.__live() if t == 'shared']
+
+    def __set_files(self):
+        self.__files = [(v, e) for t, v, e in self.__live() if t == 'file']
+
+    def __set_prefixes(self):
+        self.__prefixes = {}
+        self.__prefixes_i = {}
+        prefixes_i_patterns = []
+        for t, v, rule in self.__live():
+            if t != 'prefix':
+                continue
+            prefix, r = v
+            if r.flags & re.I:
+                self.__prefixes_i.setdefault(prefix.lower(), rule)
+                prefixes_i_patterns.append((r, rule))
+            else:
+                self.__prefixes.setdefault(prefix, rule)
+        self.__prefix_lengths = sorted(set(map(len, self.__prefixes)))
+        self.__prefix_i_lengths = sorted(set(map(len, self.__prefixes_i)))
+        # Case-insensitive prefixes are ASCII and compared with lower-cased
+        # ASCII values. Regexps may match non-ASCII characters with ASCII ones
+        # (e.g. KELVIN SIGN with 'k'), so such values are matched with the
+        # source regexps.
+        self.__prefixes_i_re = _combine_patterns(prefixes_i_patterns)
+
+    def __set_patterns(self):
+        self.__patterns = _combine_patterns(
+            [(v, e) for t, v, e in self.__live() if t == 're'])
+
+    def __set_near(self):
+        entries = []
+        for t, v, e in self.__live():
+            if t == 'near':
+                distance, name = v
+                if self.__canonical:
+                    name = canonicalize(name)
+                entries.append((distance, name, e))
+        self.__near = _NearIndex(entries)
+
+    def __set_contains(self):
+        # Case-sensitive and case-insensitive substrings are found by
+        # separate automata, the latter in lower-cased values.
+        entries = []
+        entries_i = []
+        for t, v, e in self.__live():
+            if t == 'contains':
+                ignore_case, substring = v
+                if self.__canonical:
+                    entries.append((canonicalize(substring), e))
+                elif ignore_case:
+                    entries_i.append((substring.lower(), e))
+                else:
+                    entries.append((substring, e))
+        self.__contains = _Automaton(entries)
+        self.__contains_i = _Automaton(entries_i)
+
+    def __live(self):
+        """
+        Generate parsed elements which aren't removed.
+        """
+        for p in self.__parsed:
+            if p is not None:
+                yield p
+
+    def __live_names(self):
+        """
+        Generate names of elements which aren't removed, including names
+        loaded from text files.
+        """
+        for t, v, _ in self.__live():
+            if t == 'str':
+                yield v
+            elif t == 'names':
+                for name in v:
+                    yield name
+
+    def __getstate__(self):
+        # Only joined regexps are compiled when unpickled, the sources are
+        # compiled on demand.
+        state = self.__dict__.copy()
+        state['_RuleList__patterns'] = _lazy_sources(self.__patterns)
+        state['_RuleList__prefixes_i_re'] = _lazy_sources(
+            self.__prefixes_i_re)
+        parsed = []
+        for p in self.__parsed:
+            if p is not None and p[0] == 're':
+                p = ('re', _LazyRegexp(p[1].pattern, p[1].flags), p[2])
+            elif p is not None and p[0] == 'prefix':
+                prefix, r = p[1]
+                p = ('prefix', (prefix, _LazyRegexp(r.pattern, r.flags)),
+                     p[2])
+            parsed.append(p)
+        state['_RuleList__parsed'] = parsed
+        # Keyed by ids of elements, which change when unpickled.
+        state['_RuleList__positions'] = None
+        return state
+
+    def __len__(self):
+        """
+        Return the number of positions in the list, including removed
+        elements.
+        """
+        return len(self.__parsed)
+
+    @property
+    def canonical(self):
+        """
+        Whether names are compared by their canonical forms.
+        """
+        return self.__canonical
+
+    def updated(self, parsed, removed=()):
+        """
+        Return a copy of the list with elements appended and removed.
+
+        `parsed` - the list of `(type, value, element)` tuples of elements to
+        append, as in the constructor.
+        `removed` - positions of elements to remove. Removed elements leave
+        gaps, so positions of other elements don't change.
+
+        Only indexes affected by the change are rebuilt, the rest is shared
+        with this list.
+        """
+        result = _RuleList.__new__(_RuleList)
+        result.__dict__.update(self.__dict__)
+
+        old = [self.__parsed[i] for i in set(removed)
+               if self.__parsed[i] is not None]
+        result.__parsed = list(self.__parsed)
+        for i in removed:
+            result.__parsed[i] = None
+        result.__parsed.extend(parsed)
+        result.__positions = None
+
+        changed = set(t for t, _, _ in old) | set(t for t, _, _ in parsed)
+
+        if changed & set(['str', 'names']):
+            removed_names = set()
+            for t, v, _ in old:
+                if t == 'str':
+                    removed_names.add(v)
+                elif t == 'names':
+                    removed_names.update(v)
+            added_names = []
+            for t, v, _ in parsed:
+                if t == 'str':
+                    added_names.append(v)
+                elif t == 'names':
+                    added_names.extend(v)
+
+            if self.__canonical:
+                strings = dict(self.__strings)
+                removed_keys = set(map(canonicalize, removed_names))
+                for key in removed_keys:
+                    strings.pop(key, None)
+                if removed_keys:
+                    # The same canonical forms may come from other names.
+                    for name in result.__live_names():
+                        key = canonicalize(name)
+                        if key in removed_keys:
+                            strings.setdefault(key, name)
+                for name in added_names:
+                    strings.setdefault(canonicalize(name), name)
+                result.__strings = strings
+            else:
+                if removed_names:
+                    # The same names may come from other elements.
+                    removed_names.difference_update(
+                        result.__live_names())
+                result.__strings = self.__strings.difference(
+                    removed_names).union(added_names)
+
+        if 'shared' in changed:
+            result.__set_shared()
+        if 'file' in changed:
+            result.__set_files()
+        if 'prefix' in changed:
+            result.__set_prefixes()
+        if 're' in changed:
+            result.__set_patterns()
+        if 'near' in changed:
+            result.__set_near()
+        if 'contains' in changed:
+            result.__set_contains()
+        return result
+
+    def position(self, rule):
+        """
+        Return the position of the list element `rule` in the list or None.
+        """
+        positions = self.__positions
+        if positions is None:
+            # Built on first use from the parsed elements, it's needed for
+            # instrumentation only.
+            by_key = {}
+            name_sets = []
+            for i, p in enumerate(self.__parsed):
+                if p is None:
+                    continue
+                t, v, element = p
+                if t == 'str':
+                    by_key.setdefault(element, i)
+                    continue
+                by_key.setdefault(id(element), i)
+                if t in ('names', 'shared'):
+                    name_sets.append((i, v))
+            positions = self.__positions = (by_key, name_sets)
+
+        by_key, name_sets = positions
+        if not isinstance(rule, six.string_types):
+            return by_key.get(id(rule))
+        position = by_key.get(rule)
+        # Names from text files are reported as the file element.
+        for i, names in name_sets:
+            if position is not None and i > position:
+                break
+            if rule in names:
+                return i
+        return position
+
+    def explain(self, value):
+        """
+        Match `value` against every list element one by one.
+
+        Returns the list of `(position, element, matched, elapsed_ns)` tuples
+        in the order of the list.
+        """
+        key = canonicalize(value) if self.__canonical else value
+        name = self.__find_name(key)
+
+        result = []
+        for i, p in enumerate(self.__parsed):
+            if p is None:
+                continue
+            t, v, element = p
+            started = _timer_ns()
+            if t == 'str':
+                if self.__canonical:
+                    matched = canonicalize(element) == key
+                else:
+                    matched = element == value
+            elif t == 're':
+                matched = v.match(value) is not None
+            elif t == 'prefix':
+                matched = v[1].match(value) is not None
+            elif t in ('file', 'shared'):
+                matched = key in v
+            elif t == 'contains':
+                ignore_case, substring = v
+                if self.__canonical:
+                    matched = canonicalize(substring) in key
+                elif ignore_case:
+                    matched = substring.lower() in value.lower()
+                else:
+                    matched = substring in value
+            elif t == 'near':
+                distance, near_name = v
+                if self.__canonical:
+                    near_name = canonicalize(near_name)
+                matched = _edit_distance(key, near_name, distance) <= distance
+            else:
+                # A text file, its names are among the list names.
+                matched = name is not None and self.position(name) == i
+            result.append((i, element, matched, _timer_ns() - started))
+        return result
+
+    def match_strings(self, values):
+        """
+        Return the dictionary of `values` which are in the list as names and
+        the names.
+        """
+        if self.__canonical or self.__shared:
+            result = {}
+            for value in values:
+                name = self.__find_name(
+                    canonicalize(value) if self.__canonical else value)
+                if name is not None:
+                    result[value] = name
+            return result
+        return dict((v, v) for v in self.__strings.intersection(values))
+
+    def find(self, value):
+        """
+        Return the list element which matches `value` or None.
+        """
+        if self.__canonical:
+            key = canonicalize(value)
+            name = self.__find_name(key)
+            if name is not None:
+                return name
+            return self.find_other(value, key)
+
+        if value in self.__strings:
+            return value
+        if self.__shared and self.__in_shared(value):
+            return value
+        return self.find_other(value)
+
+    def find_other(self, value, key=None):
+        """
+        Return the list element other than a name which matches `value` or
+        None.
+
+        `key` - the canonical form of `value` if it's already known.
+        """
+        if self.__files:
+            if key is None:
+                key = canonicalize(value) if self.__canonical else value
+            for f, rule in self.__files:
+                if key in f:
+                    return rule
+
+        rule = _find_prefix(self.__prefixes, self.__prefix_lengths, value)
+        if rule is None and self.__prefixes_i:
+            if _is_ascii(value):
+                rule = _find_prefix(self.__prefixes_i,
+                                    self.__prefix_i_lengths, value.lower())
+            else:
+                rule = _match_rule(self.__prefixes_i_re, value)
+        if rule is None and self.__contains:
+            if self.__canonical:
+                if key is None:
+                    key = canonicalize(value)
+                rule = self.__contains.find(key)
+            else:
+                rule = self.__contains.find(value)
+        if rule is None and self.__contains_i:
+            rule = self.__contains_i.find(value.lower())
+        if rule is None and self.__near:
+            if key is None:
+                key = canonicalize(value) if self.__canonical else value
+            rule = self.__near.find(key)
+        if rule is None:
+            rule = _match_rule(self.__patterns, value)
+        return rule
+
 
 class Checker(object):
     """
@@ -52,6 +1038,62 @@ class Checker(object):
 
     Of course, it's possible to use 3-element lists or another suitable type
     instead of tuple.
+
+    Names can also be kept in files set by 2-element tuples ('file', path).
+    A text file with one name per line is read into memory. A file made by
+    `build_registration_names_file` management command is memory mapped and
+    searched without loading, which suits huge lists.
+
+    The optional 'cache_size' key enables the cache of results of `check` for
+    this number of recently checked names. See `cache_info` for its
+    statistics.
+
+    The optional 'instrument' key set to True enables statistics of checks
+    and rules (see `stats`) and `registration_names.signals.name_checked`
+    signal sent after every check.
+
+    When several elements of a list match a value, the element reported as
+    the deciding one (by `check_many`, `explain`, statistics and the signal)
+    is found by kind: names, name files, prefixes, substrings, 'near' names
+    and then other regexps in the order of the list. So it may be not the
+    first matching element of the list; `explain` shows all of them.
+
+    The optional 'max_length' key sets the maximum length of allowed names.
+    Longer names aren't allowed and aren't matched with regexps at all.
+
+    The optional 'regexp_safety' key enables the analysis of regexps for
+    shapes which may take exponential time to match, such as nested
+    quantifiers ('(a+)+'). With 'warn' such regexps cause RuntimeWarning, with
+    'raise' - ImproperlyConfigured.
+
+    Substrings are set by 3-element tuples ('contains', keys, substring):
+    values containing `substring` match. Keys are '' or 'i' for lower-cased
+    comparison. All substrings of a list are found in one pass over a value.
+    In canonical lists canonical forms are compared.
+
+    Names similar to a name are set by 3-element tuples ('near', distance,
+    name): values within the edit (Levenshtein) distance of `name` match,
+    e.g. ('near', 1, 'admin') matches 'adm1n' and 'admins'. The distance is
+    from 1 to 3 and less than the length of `name`. In canonical lists
+    canonical forms are compared.
+
+    The optional 'shared_index' key is the path of a directory where names
+    of text files of the lists are written to memory mapped files (see
+    `registration_names.namefiles`) instead of being kept in memory. Worker
+    processes building checkers with the same text files map the same
+    files, so they share one copy of the names. Names found in such files
+    are reported as the rules by their canonical forms in canonical lists.
+    When a text file changes, the older files written for it are removed.
+
+    Checkers can be pickled, see `registration_names.snapshots`.
+
+    Lists of a built checker can be changed with `add_allowed`,
+    `add_prohibited`, `remove_rule` and `apply_diff`.
+
+    The optional 'canonical' key is a list of list names ('allowed' and/or
+    'prohibited') where names are compared by their canonical forms: case
+    folded, NFKC-normalized and with confusable characters replaced, so e.g.
+    'ADMIN' and Cyrillic 'аdmin' match 'admin'. Regexps aren't affected.
     """
 
     __CONTROL_TYPE = 'control_type'
@@ -68,12 +1110,25 @@ class Checker(object):
         The format is discribed early.
         """
         self.__control_type = None
+        self.__shared_index = None
+        # The lists and the results cache, replaced at once on changes.
+        self.__state = (None, None, None)
+        self.__stats = None
+        self.__max_length = None
+        self.__regexp_safety = None
 
         if root is None:
             return
 
         KEY_ALLOWED = 'allowed'
         KEY_PROHIBITED = 'prohibited'
+        KEY_CANONICAL = 'canonical'
+        KEY_CACHE_SIZE = 'cache_size'
+        KEY_INSTRUMENT = 'instrument'
+        KEY_MAX_LENGTH = 'max_length'
+        KEY_REGEXP_SAFETY = 'regexp_safety'
+        KEY_SHARED_INDEX = 'shared_index'
+        REGEXP_SAFETY_VALUES = ('warn', 'raise')
 
         POSSIBLE_CONTROL_TYPES_STR = "'{}', '{}', '{}' and '{}'".format(
             self.__CONTROL_TYPE_ALLOWED,
@@ -97,10 +1152,52 @@ class Checker(object):
                 "'{}' possible values: "
                 "{}.".format(self.__CONTROL_TYPE, POSSIBLE_CONTROL_TYPES_STR))
 
-        self.__allowed_str = None
-        self.__allowed_re = None
-        self.__prohibited_str = None
-        self.__prohibited_re = None
+        canonical = root.get(KEY_CANONICAL, ())
+        if (isinstance(canonical, six.string_types) or
+                not isinstance(canonical, (list, tuple, set, frozenset)) or
+                not set(canonical) <= set([KEY_ALLOWED, KEY_PROHIBITED])):
+            raise ImproperlyConfigured(
+                "The value of '{}' must be a sequence of list names: "
+                "'{}' and/or '{}'. '{}' given.".format(
+                    KEY_CANONICAL, KEY_ALLOWED, KEY_PROHIBITED, canonical))
+
+        cache_size = root.get(KEY_CACHE_SIZE, 0)
+        if not isinstance(cache_size, six.integer_types) or cache_size < 0:
+            raise ImproperlyConfigured(
+                "The value of '{}' must be a non-negative integer. "
+                "'{}' given.".format(KEY_CACHE_SIZE, cache_size))
+        cache = None
+        if cache_size:
+            cache = _LRUCache(cache_size)
+
+        if root.get(KEY_INSTRUMENT):
+            self.__stats = _Stats()
+
+        self.__max_length = root.get(KEY_MAX_LENGTH)
+        if self.__max_length is not None and (
+                not isinstance(self.__max_length, six.integer_types) or
+                self.__max_length < 0):
+            raise ImproperlyConfigured(
+                "The value of '{}' must be a non-negative integer. "
+                "'{}' given.".format(KEY_MAX_LENGTH, self.__max_length))
+
+        self.__regexp_safety = root.get(KEY_REGEXP_SAFETY)
+        if (self.__regexp_safety is not None and
+                self.__regexp_safety not in REGEXP_SAFETY_VALUES):
+            raise ImproperlyConfigured(
+                "'{}' possible values: 'warn' and 'raise'. '{}' given."
+                "".format(KEY_REGEXP_SAFETY, self.__regexp_safety))
+
+        self.__shared_index = root.get(KEY_SHARED_INDEX)
+        if (self.__shared_index is not None and
+                (not isinstance(self.__shared_index, six.string_types) or
+                 not os.path.isdir(self.__shared_index))):
+            raise ImproperlyConfigured(
+                "'{}' must be the path of an existing directory. '{}' given."
+                "".format(KEY_SHARED_INDEX, self.__shared_index))
+
+        allowed = None
+        prohibited = None
 
         if (self.__control_type == self.__CONTROL_TYPE_ALLOWED or
                 self.__control_type == self.__CONTROL_TYPE_ALLOWED_PROHIBITED):
@@ -110,8 +1207,8 @@ class Checker(object):
                     "list not found.".format(self.__CONTROL_TYPE,
                                              root[self.__CONTROL_TYPE],
                                              KEY_ALLOWED))
-            self.__allowed_str, self.__allowed_re = self.__parse_list(
-                root[KEY_ALLOWED], KEY_ALLOWED)
+            allowed = self.__parse_list(
+                root[KEY_ALLOWED], KEY_ALLOWED, KEY_ALLOWED in canonical)
 
         if (self.__control_type == self.__CONTROL_TYPE_PROHIBITED or
                 self.__control_type == self.__CONTROL_TYPE_ALLOWED_PROHIBITED):
@@ -121,10 +1218,14 @@ class Checker(object):
                     "list not found.".format(self.__CONTROL_TYPE,
                                              self.__control_type,
                                              KEY_PROHIBITED))
-            self.__prohibited_str, self.__prohibited_re = self.__parse_list(
-                root[KEY_PROHIBITED], KEY_PROHIBITED)
+            prohibited = self.__parse_list(
+                root[KEY_PROHIBITED], KEY_PROHIBITED,
+                KEY_PROHIBITED in canonical)
+
+        self.__state = (allowed, prohibited, cache)
 
-    def __parse_list_element(self, list_name, element, element_n):
+    def __parse_list_element(self, list_name, element, element_n,
+                             canonical=False):
         """
         Parse element from the list with all necessary checks.
 
@@ -132,8 +1233,40 @@ class Checker(object):
         'allowed_and_prohibited').
         `element` - the element from the list to parse.
         `element_n` - the element's position in the list.
+        `canonical` - whether names of the list are compared by their
+        canonical forms.
         """
 
+        parsed = self.__parse_element(list_name, element, element_n,
+                                      canonical)
+        if canonical:
+            self.__check_canonical(list_name, parsed, element_n)
+        return parsed
+
+    def __check_canonical(self, list_name, parsed, element_n):
+        """
+        Check that the name of a parsed element of a canonical list can be
+        reduced to its canonical form.
+        """
+
+        if parsed[0] == 'str':
+            name = parsed[1]
+        elif parsed[0] in ('contains', 'near'):
+            name = parsed[1][1]
+        else:
+            return
+        try:
+            canonicalize(name)
+        except UnicodeDecodeError as e:
+            # Byte strings which aren't ASCII on Python 2.
+            raise ImproperlyConfigured(
+                "Name {!r} in '{}' on position {} must be a unicode string "
+                "to be compared by its canonical form: {}".format(
+                    name, list_name, element_n, e))
+
+    def __parse_element(self, list_name, element, element_n, canonical):
+        # See `__parse_list_element`.
+
         KEYS_STR = "'i'"
 
         if isinstance(element, six.string_types):
@@ -148,11 +1281,21 @@ class Checker(object):
                 "tuples or lists. Element on position {}: '{}'.".format(
                     list_name, element_n, element))
 
+        if length == 2 and element[0] == 'file':
+            return self.__parse_file(list_name, element, element_n,
+                                     canonical)
+
         if length != 3:
             raise ImproperlyConfigured(
                 "3-element tuple is expected in '{}' on position {}, "
                 "'{}' given.".format(list_name, element_n, element))
 
+        if element[0] == 'near':
+            return self.__parse_near(list_name, element, element_n)
+
+        if element[0] == 'contains':
+            return self.__parse_contains(list_name, element, element_n)
+
         # The first must be a 're' string.
         if element[0] != 're':
             raise ImproperlyConfigured(
@@ -182,14 +1325,138 @@ class Checker(object):
                     "Possible keys: {}."
                     "".format(k, list_name, element_n, KEYS_STR))
 
-        return ('re', re.compile(element[2], re_flags),)
+        r = re.compile(element[2], re_flags)
+
+        if (self.__regexp_safety is not None and
+                _has_nested_quantifiers(element[2], re_flags)):
+            message = (
+                "Regexp in '{}' on position {} has nested quantifiers and "
+                "may take exponential time to match: '{}'."
+                "".format(list_name, element_n, element[2]))
+            if self.__regexp_safety == 'raise':
+                raise ImproperlyConfigured(message)
+            warnings.warn(message, RuntimeWarning)
 
-    def __parse_list(self, patterns_list, list_name):
+        # Regexps which only check a literal prefix are looked up in an index
+        # instead of matching. Case-insensitive prefixes are indexed only when
+        # they are ASCII, since `lower()` is different from regexp case
+        # folding outside ASCII.
+        prefix = _literal_prefix(element[2])
+        if prefix is not None and (not re_flags or _is_ascii(prefix)):
+            return ('prefix', (prefix, r),)
+
+        return ('re', r,)
+
+    def __parse_near(self, list_name, element, element_n):
+        """
+        Parse 'near' element of the list.
+
+        `list_name` - the name of the list.
+        `element` - the element from the list to parse.
+        `element_n` - the element's position in the list.
+        """
+
+        distance = element[1]
+        if (not isinstance(distance, six.integer_types) or
+                isinstance(distance, bool) or
+                not 1 <= distance <= _MAX_NEAR_DISTANCE):
+            raise ImproperlyConfigured(
+                "Second element of 'near' tuple in '{}' on position {} must "
+                "be an edit distance from 1 to {}. '{}' given.".format(
+                    list_name, element_n, _MAX_NEAR_DISTANCE, distance))
+
+        if not isinstance(element[2], six.string_types):
+            raise ImproperlyConfigured(
+                "Third element of 'near' tuple in '{}' on position {} must "
+                "be a string.".format(list_name, element_n))
+
+        # Any name not longer than the distance would match.
+        if distance >= len(element[2]):
+            raise ImproperlyConfigured(
+                "Edit distance of 'near' tuple in '{}' on position {} must "
+                "be less than the length of '{}'.".format(
+                    list_name, element_n, element[2]))
+
+        return ('near', (distance, element[2]),)
+
+    def __parse_contains(self, list_name, element, element_n):
+        """
+        Parse 'contains' element of the list.
+
+        `list_name` - the name of the list.
+        `element` - the element from the list to parse.
+        `element_n` - the element's position in the list.
+        """
+
+        if not isinstance(element[1], six.string_types) or \
+                element[1] not in ('', 'i'):
+            raise ImproperlyConfigured(
+                "Second element of 'contains' tuple in '{}' on position {} "
+                "must be '' or 'i'. '{}' given.".format(
+                    list_name, element_n, element[1]))
+
+        if not isinstance(element[2], six.string_types) or not element[2]:
+            raise ImproperlyConfigured(
+                "Third element of 'contains' tuple in '{}' on position {} "
+                "must be a non-empty string.".format(list_name, element_n))
+
+        return ('contains', (element[1] == 'i', element[2]),)
+
+    def __parse_file(self, list_name, element, element_n, canonical=False):
+        """
+        Parse 'file' element of the list and load the file.
+
+        `list_name` - the name of the list.
+        `element` - the element from the list to parse.
+        `element_n` - the element's position in the list.
+        `canonical` - whether names of the list are compared by their
+        canonical forms.
+
+        With a shared index names of a text file are mapped from its shared
+        name file, they are read only to write it.
+        """
+
+        path = element[1]
+        if not isinstance(path, six.string_types):
+            raise ImproperlyConfigured(
+                "Second element of 'file' tuple in '{}' on position {} must "
+                "be a path string. '{}' given.".format(
+                    list_name, element_n, path))
+
+        try:
+            if namefiles.is_sorted_file(path):
+                return ('file', namefiles.SortedNameFile(path),)
+            if self.__shared_index is None:
+                # Kept by the element, so it's removed without reading the
+                # file again.
+                return ('names', frozenset(namefiles.read_text_names(path)),)
+            shared_path = _shared_text_path(self.__shared_index, path,
+                                            canonical)
+        except (IOError, OSError, ValueError) as e:
+            raise ImproperlyConfigured(
+                "Can't read file '{}' in '{}' on position {}: {}".format(
+                    path, list_name, element_n, e))
+
+        def names():
+            names = namefiles.read_text_names(path)
+            return map(canonicalize, names) if canonical else names
+
+        try:
+            return ('shared', _shared_names_file(shared_path, names),)
+        except (IOError, OSError, ValueError) as e:
+            # Including a corrupt or truncated shared file.
+            raise ImproperlyConfigured(
+                "Can't share names of file '{}' in '{}' on position {} "
+                "through the shared index: {}".format(
+                    path, list_name, element_n, e))
+
+    def __parse_list(self, patterns_list, list_name, canonical=False):
         """
         Parse 'allowed', 'prohibited' or 'allowed_and_prohibited' list.
 
         `patterns_list` - the list.
         `list_name` - the name of the list.
+        `canonical` - whether names are compared by their canonical forms.
         """
 
         # Common error - a string instead of a sequence of strings.
@@ -206,60 +1473,335 @@ class Checker(object):
                 "The value of '{}' must be an iterable sequence "
                 "(list, tuple). '{}' given.".format(list_name, patterns_list))
 
-        result_str = []
-        result_re = []
+        parsed = []
         for i, p in enumerate(patterns_list):
-            t, v = self.__parse_list_element(list_name, p, i)
-            if t == 're':
-                result_re.append(v)
-            else:
-                result_str.append(v)
-        return result_str, result_re
+            parsed.append(self.__parse_list_element(
+                list_name, p, i, canonical) + (p,))
+        return _RuleList(parsed, canonical)
 
-    def __check_allowed(self):
+    def check(self, value):
         """
-        Determine if checking of allowed is required.
+        Check passed `value` according to the checker's configuration.
         """
 
-        return (self.__control_type == self.__CONTROL_TYPE_ALLOWED or
-                self.__control_type == self.__CONTROL_TYPE_ALLOWED_PROHIBITED)
+        state = self.__state
+        if state[2] is None and self.__stats is None:
+            return self.__check(value, state)
 
-    def __check_prohibited(self):
+        started = _timer_ns()
+        cache = state[2]
+        decision = None
+        if cache is not None:
+            decision = cache.get(value)
+        if decision is None:
+            decision = self.__decide(value, state)
+            if cache is not None:
+                cache.set(value, decision)
+
+        if self.__stats is not None:
+            self.__record(value, decision, _timer_ns() - started, state)
+        return decision[0]
+
+    def __decide(self, value, state):
         """
-        Determine if checking of prohibited is required.
+        Check `value` and return the tuple of the result, the name of the
+        list which decided it and the list element which did.
+
+        `state` - the lists and the results cache of the checker.
         """
 
-        return (self.__control_type == self.__CONTROL_TYPE_PROHIBITED or
-                self.__control_type == self.__CONTROL_TYPE_ALLOWED_PROHIBITED)
+        if self.__control_type == self.__CONTROL_TYPE_DISABLED:
+            return (True, None, None)
 
-    def check(self, value):
+        if self.__max_length is not None and len(value) > self.__max_length:
+            return (False, None, None)
+
+        allowed, prohibited, _ = state
+
+        rule = None
+        if allowed is not None:
+            rule = allowed.find(value)
+            if rule is None:
+                return (False, 'allowed', None)
+
+        if prohibited is not None:
+            prohibited_rule = prohibited.find(value)
+            if prohibited_rule is not None:
+                return (False, 'prohibited', prohibited_rule)
+
+        if rule is None:
+            return (True, None, None)
+        return (True, 'allowed', rule)
+
+    def __position(self, list_name, rule, state):
         """
-        Check passed `value` according to the checker's configuration.
+        Return the position of the element `rule` of the list or None.
+        """
+
+        if rule is None:
+            return None
+        if list_name == 'allowed':
+            return state[0].position(rule)
+        return state[1].position(rule)
+
+    def __record(self, value, decision, elapsed_ns, state):
+        """
+        Update instrumentation statistics and send `name_checked` signal.
+        """
+
+        allowed, list_name, rule = decision
+        rule_index = self.__position(list_name, rule, state)
+
+        self.__stats.add(list_name, rule_index, elapsed_ns)
+        name_checked.send(
+            sender=self.__class__, checker=self, username=value,
+            allowed=allowed, list_name=list_name, rule=rule,
+            rule_index=rule_index, elapsed_ns=elapsed_ns)
+
+    def explain(self, value):
+        """
+        Explain the result of the check of `value`.
+
+        Returns a dictionary with the result ('allowed'), the name of the list
+        which decided it ('list_name'), the deciding element of the list
+        ('rule') and its position ('rule_index'); the latter three are None
+        when no list element decided the result. 'rules' is the list of
+        dictionaries for every element of the checked lists: 'list_name',
+        'rule_index', 'rule', whether it matches `value` ('matched') and
+        the time of matching it alone in nanoseconds ('elapsed_ns').
+
+        Every element is matched separately, so this is much slower than
+        `check`.
+        """
+
+        state = self.__state
+        allowed, list_name, rule = self.__decide(value, state)
+        rule_index = self.__position(list_name, rule, state)
+
+        rules = []
+        too_long = (self.__max_length is not None and
+                    len(value) > self.__max_length)
+        if self.__control_type != self.__CONTROL_TYPE_DISABLED and \
+                not too_long:
+            for name, rule_list in (('allowed', state[0]),
+                                    ('prohibited', state[1])):
+                if rule_list is None:
+                    continue
+                for i, element, matched, elapsed_ns in rule_list.explain(
+                        value):
+                    rules.append({
+                        'list_name': name,
+                        'rule_index': i,
+                        'rule': element,
+                        'matched': matched,
+                        'elapsed_ns': elapsed_ns,
+                    })
+
+        return {
+            'allowed': allowed,
+            'list_name': list_name,
+            'rule': rule,
+            'rule_index': rule_index,
+            'rules': rules,
+        }
+
+    def stats(self):
+        """
+        Return instrumentation statistics or None if instrumentation isn't
+        enabled.
+
+        The statistics is a dictionary with the number of checks ('checks'),
+        their total and maximum duration in nanoseconds ('total_ns',
+        'max_ns') and numbers of results decided by each rule ('rules') by
+        `(list_name, rule_index)` tuples.
+        """
+
+        if self.__stats is None:
+            return None
+        return self.__stats.as_dict()
+
+    def cache_info(self):
+        """
+        Return statistics of the results cache as `CacheInfo` or None if the
+        cache isn't enabled.
+        """
+
+        cache = self.__state[2]
+        if cache is None:
+            return None
+        return cache.info()
+
+    def __check(self, value, state):
+        """
+        Check `value` without the results cache.
+
+        `state` - the lists and the results cache of the checker.
         """
 
         if self.__control_type == self.__CONTROL_TYPE_DISABLED:
             return True
 
-        allowed = True
-        if self.__check_allowed():
-            allowed = (value in self.__allowed_str)
-            if not allowed:
-                for r in self.__allowed_re:
-                    if r.match(value):
-                        allowed = True
-                        break
-        if not allowed:
+        if self.__max_length is not None and len(value) > self.__max_length:
             return False
 
-        prohibited = False
-        if self.__check_prohibited():
-            prohibited = (value in self.__prohibited_str)
-            if not prohibited:
-                for r in self.__prohibited_re:
-                    if r.match(value):
-                        prohibited = True
-                        break
-        if prohibited:
-            return False
+        allowed, prohibited, _ = state
+
+        if allowed is not None:
+            if allowed.find(value) is None:
+                return False
+
+        if prohibited is not None:
+            if prohibited.find(value) is not None:
+                return False
 
         return True
+
+    def check_many(self, values, chunk_size=1000):
+        """
+        Check many values at once, e.g. usernames of existing users.
+
+        `values` - an iterable of values. It's consumed lazily by chunks of
+        `chunk_size` values, so a queryset iterator may be passed without
+        loading all the values into memory.
+
+        Generates `(value, allowed, rule)` tuples in the order of `values`.
+        `rule` is the list element which decided the result: the element of
+        'allowed' list for allowed values (None when 'allowed' list isn't
+        checked) and the element of 'prohibited' list for not allowed ones
+        (None when the value isn't in 'allowed' list or is too long).
+        """
+
+        disabled = self.__control_type == self.__CONTROL_TYPE_DISABLED
+        allowed, prohibited, _ = self.__state
+        check_allowed = not disabled and allowed is not None
+        check_prohibited = not disabled and prohibited is not None
+
+        values = iter(values)
+        while True:
+            chunk = list(itertools.islice(values, chunk_size))
+            if not chunk:
+                return
+
+            if check_allowed:
+                allowed_str = allowed.match_strings(chunk)
+            if check_prohibited:
+                prohibited_str = prohibited.match_strings(chunk)
+
+            for value in chunk:
+                if (not disabled and self.__max_length is not None and
+                        len(value) > self.__max_length):
+                    yield (value, False, None)
+                    continue
+
+                rule = None
+                if check_allowed:
+                    if value in allowed_str:
+                        rule = allowed_str[value]
+                    else:
+                        rule = allowed.find_other(value)
+                        if rule is None:
+                            yield (value, False, None)
+                            continue
+
+                if check_prohibited:
+                    if value in prohibited_str:
+                        yield (value, False, prohibited_str[value])
+                        continue
+                    prohibited_rule = prohibited.find_other(value)
+                    if prohibited_rule is not None:
+                        yield (value, False, prohibited_rule)
+                        continue
+
+                yield (value, True, rule)
+
+    def add_allowed(self, *elements):
+        """
+        Append elements to 'allowed' list, see `apply_diff`.
+        """
+
+        self.apply_diff(added={'allowed': elements})
+
+    def add_prohibited(self, *elements):
+        """
+        Append elements to 'prohibited' list, see `apply_diff`.
+        """
+
+        self.apply_diff(added={'prohibited': elements})
+
+    def remove_rule(self, list_name, index):
+        """
+        Remove the element on position `index` from the list, see
+        `apply_diff`.
+        """
+
+        self.apply_diff(removed={list_name: [index]})
+
+    def apply_diff(self, added=None, removed=None):
+        """
+        Change the lists without building a new checker.
+
+        `added` - a dictionary of sequences of elements to append to the lists
+        by list names ('allowed' or 'prohibited').
+        `removed` - a dictionary of sequences of positions of elements to
+        remove by list names. Positions of other elements don't change.
+
+        New elements are validated like elements of the configuration. Only
+        indexes affected by the change are rebuilt, the source lists of the
+        configuration aren't changed. The changed lists are published at once,
+        so concurrent checks see either old or new lists. The results cache
+        is dropped.
+        """
+
+        added = added or {}
+        removed = removed or {}
+
+        with _update_lock:
+            allowed, prohibited, cache = self.__state
+            lists = {'allowed': allowed, 'prohibited': prohibited}
+
+            changed = {}
+            for list_name in set(added) | set(removed):
+                rule_list = lists.get(list_name)
+                if rule_list is None:
+                    raise ValueError(
+                        "'{}' list isn't checked with '{}' set to "
+                        "'{}'.".format(list_name, self.__CONTROL_TYPE,
+                                       self.__control_type))
+
+                positions = removed.get(list_name, ())
+                for i in positions:
+                    if not 0 <= i < len(rule_list):
+                        raise IndexError(
+                            "No element on position {} in '{}'.".format(
+                                i, list_name))
+
+                parsed = []
+                for n, element in enumerate(added.get(list_name, ())):
+                    parsed.append(self.__parse_list_element(
+                        list_name, element, len(rule_list) + n,
+                        canonical=rule_list.canonical) + (element,))
+                changed[list_name] = rule_list.updated(parsed, positions)
+
+            lists.update(changed)
+            if cache is not None:
+                cache = _LRUCache(cache.info().max_size)
+            self.__state = (lists['allowed'], lists['prohibited'], cache)
+
+
+def get_checker():
+    """
+    Return the checker built from `REGISTRATION_NAMES` setting.
+
+    The checker is built once per process and rebuilt when the setting refers
+    to another configuration object or is changed with `override_settings`
+    and similar tools.
+
+    When the setting has 'database' key set to True, rules stored in the
+    database are added to the lists (see `registration_names.store`).
+    Otherwise, if `REGISTRATION_NAMES_SNAPSHOT` setting is set, the checker
+    is loaded from this snapshot file (see `registration_names.snapshots`).
+
+    The checker is kept by `registration_names.holders.default_holder`.
+    """
+    from registration_names.holders import default_holder
+    return default_holder.get()
@@ -1,25 +1,82 @@
-from django.conf import settings
+import threading
+
 from django import forms
 from django.utils.translation import ugettext_lazy as _
 
 from registration.forms import RegistrationForm
 
-from checkers import Checker
+from holders import default_holder
 
 
-class RegistrationNameControlForm(RegistrationForm):
+class QueryStats(object):
     """
-    Form for registering a new user account which checks username to be allowed
-    for registeration.
+    Counters of username checks of the forms and uniqueness queries avoided
+    by rejecting usernames before them.
     """
 
-    def clean_username(self):
-        ROOT_CONFIG = 'REGISTRATION_NAMES'
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__checks = 0
+        self.__avoided = 0
+
+    def add(self, avoided):
+        with self.__lock:
+            self.__checks += 1
+            if avoided:
+                self.__avoided += 1
+
+    def reset(self):
+        with self.__lock:
+            self.__checks = 0
+            self.__avoided = 0
+
+    def as_dict(self):
+        """
+        Return the dictionary with the number of checks ('checks'), queries
+        made ('queries') and avoided ('queries_avoided').
+        """
+        with self.__lock:
+            return {
+                'checks': self.__checks,
+                'queries': self.__checks - self.__avoided,
+                'queries_avoided': self.__avoided,
+            }
+
+
+# Counters of all forms with `NameControlMixin`.
+query_stats = QueryStats()
+
+
+class NameControlMixin(object):
+    """
+    Mixin for django-registration forms which checks username to be allowed
+    for registration.
 
-        checker = Checker(getattr(settings, ROOT_CONFIG, None))
-        username = super(RegistrationNameControlForm, self).clean_username()
+    Checks are ordered by cost: the field's length and charset validation,
+    then rules of the checker and only then `clean_username` of the form,
+    which queries the database for an existing user. So not allowed
+    usernames don't cost a query. Usage with other forms:
 
-        if checker.check(username):
-            return username
-        else:
+        class Form(NameControlMixin, RegistrationFormUniqueEmail):
+            pass
+    """
+
+    # The holder of the checker used by the form.
+    checker_holder = default_holder
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+
+        if not self.checker_holder.get().check(username):
+            query_stats.add(avoided=True)
             raise forms.ValidationError(_("This username isn't allowed."))
+
+        query_stats.add(avoided=False)
+        return super(NameControlMixin, self).clean_username()
+
+
+class RegistrationNameControlForm(NameControlMixin, RegistrationForm):
+    """
+    Form for registering a new user account which checks username to be allowed
+    for registeration.
+    """
@@ -0,0 +1,284 @@
+"""
+Holders of built checkers.
+
+A holder keeps the current checker built from a source (settings, a JSON
+file or the database) and replaces it with a new one when the source changes.
+The checker is published by replacing a single attribute, so threads calling
+`get()` never take a lock or see a partially built checker; only threads
+building a checker are serialized.
+
+By default the source is checked for changes on every `get()` and the checker
+is rebuilt in the calling thread. With `start_reloader()` a background thread
+checks the source and rebuilds the checker instead, so requests never wait
+for a build (except the first one).
+
+`default_holder` builds the checker from `REGISTRATION_NAMES` setting and is
+used by `get_checker` and `RegistrationNameControlForm`.
+"""
+import io
+import json
+import os
+import threading
+import warnings
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from registration_names.checkers import (
+    Checker, DATABASE_KEY, ROOT_CONFIG, SNAPSHOT_CONFIG, URLS_KEY)
+
+
+def prepare_root(root):
+    """
+    Return the configuration dictionary with names derived from the project
+    added: first path segments of the root URLconf when 'prohibit_urls' key
+    is set to True (see `registration_names.backends.utils.add_url_names`).
+    """
+    if isinstance(root, dict) and root.get(URLS_KEY):
+        from registration_names.backends.utils import add_url_names
+        return add_url_names(root)
+    return root
+
+
+class SettingsSource(object):
+    """
+    `REGISTRATION_NAMES` setting.
+
+    Rules from the database are added when the setting has 'database' key set
+    to True (see `registration_names.store`). Otherwise, if
+    `REGISTRATION_NAMES_SNAPSHOT` setting is set, the checker is loaded from
+    this snapshot file (see `registration_names.snapshots`). See also
+    `prepare_root`.
+    """
+
+    def version(self):
+        """
+        Return the value which changes when the checker must be rebuilt.
+        """
+        root = getattr(settings, ROOT_CONFIG, None)
+        if isinstance(root, dict) and root.get(DATABASE_KEY):
+            from registration_names.store import get_version
+            return (root, get_version())
+        return (root, getattr(settings, SNAPSHOT_CONFIG, None))
+
+    def load(self):
+        """
+        Build the checker.
+        """
+        root = getattr(settings, ROOT_CONFIG, None)
+        if isinstance(root, dict) and root.get(DATABASE_KEY):
+            from registration_names.store import load_root
+            return Checker(prepare_root(load_root(root)))
+
+        snapshot_path = getattr(settings, SNAPSHOT_CONFIG, None)
+        if snapshot_path:
+            from registration_names.snapshots import load_snapshot
+            checker = load_snapshot(root, snapshot_path)
+            if checker is not None:
+                return checker
+        return Checker(prepare_root(root))
+
+
+class FileSource(object):
+    """
+    The configuration dictionary in a JSON file.
+
+    The file is read again when its modification time or size changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def version(self):
+        st = os.stat(self.path)
+        return (st.st_mtime, st.st_size)
+
+    def load(self):
+        with io.open(self.path, encoding='utf-8') as f:
+            return Checker(json.load(f))
+
+
+class DatabaseSource(object):
+    """
+    The configuration dictionary with rules from the database added (see
+    `registration_names.store`).
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def version(self):
+        from registration_names.store import get_version
+        return get_version()
+
+    def load(self):
+        from registration_names.store import load_root
+        return Checker(prepare_root(load_root(self.root)))
+
+
+# Serializes restarts of reloaders in forked processes.
+_fork_lock = threading.Lock()
+
+
+class _Reloader(threading.Thread):
+    """
+    The thread which reloads the checker of a holder periodically.
+    """
+
+    def __init__(self, holder, interval):
+        super(_Reloader, self).__init__(name='registration-names-reloader')
+        self.daemon = True
+        self.holder = holder
+        self.interval = interval
+        self.stopped = threading.Event()
+        # Threads don't survive fork(), see `CheckerHolder.get`.
+        self.pid = os.getpid()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.holder.reload()
+            except Exception as e:
+                # Keep the current checker until the source is fixed.
+                warnings.warn(
+                    "Can't reload registration names checker: {}".format(e),
+                    RuntimeWarning)
+
+
+class CheckerHolder(object):
+    """
+    The holder of the current checker built from `source`.
+
+    `source` - an object with `version()` method returning a value which
+    changes when the checker must be rebuilt and `load()` method building
+    the checker, e.g. `SettingsSource`, `FileSource` or `DatabaseSource`.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        # The tuple of the version of the source and the checker built from
+        # it, replaced at once.
+        self.__current = None
+        # Serializes builds only.
+        self.__lock = threading.Lock()
+        self.__reloader = None
+
+    def get(self):
+        """
+        Return the current checker.
+
+        Without the background reloader the source is checked for changes
+        first. While another thread rebuilds the checker the previous one is
+        returned.
+
+        The reloader started before the process was forked (e.g. in a master
+        process of a web server) is started again in the child process.
+        """
+        current = self.__current
+        reloader = self.__reloader
+        if current is not None and reloader is not None:
+            if reloader.pid != os.getpid():
+                self.__restart_reloader(reloader)
+            return current[1]
+
+        version = self.source.version()
+        if current is not None and current[0] == version:
+            return current[1]
+
+        if not self.__lock.acquire(False):
+            if current is not None:
+                return current[1]
+            self.__lock.acquire()
+        try:
+            return self.__load(version)
+        finally:
+            self.__lock.release()
+
+    def check(self, value):
+        """
+        Check `value` with the current checker.
+        """
+        return self.get().check(value)
+
+    def reload(self, force=False):
+        """
+        Rebuild the checker if the source has changed.
+
+        `force` - rebuild the checker even if the source hasn't changed.
+
+        Returns the current checker.
+        """
+        with self.__lock:
+            return self.__load(self.source.version(), force)
+
+    def set(self, checker):
+        """
+        Replace the current checker with `checker` until the source changes.
+        """
+        with self.__lock:
+            self.__current = (self.source.version(), checker)
+
+    def clear(self):
+        """
+        Drop the current checker, the next `get()` builds a new one.
+        """
+        self.__current = None
+
+    def __load(self, version, force=False):
+        # Must be called with the lock held.
+        current = self.__current
+        if not force and current is not None and current[0] == version:
+            # Built by another thread meanwhile.
+            return current[1]
+        checker = self.source.load()
+        self.__current = (version, checker)
+        return checker
+
+    def start_reloader(self, interval=5):
+        """
+        Start the thread which checks the source every `interval` seconds
+        and rebuilds the checker when it changes. `get()` doesn't check the
+        source anymore.
+
+        The current checker is built first unless it's already built.
+        """
+        self.get()
+        if self.__reloader is None:
+            self.__reloader = _Reloader(self, interval)
+            self.__reloader.start()
+
+    def __restart_reloader(self, reloader):
+        with _fork_lock:
+            if self.__reloader is not reloader:
+                # Restarted by another thread.
+                return
+            # The lock may have been held by a thread of the parent process,
+            # which doesn't exist here.
+            self.__lock = threading.Lock()
+            self.__reloader = _Reloader(self, reloader.interval)
+            self.__reloader.start()
+
+    def stop_reloader(self):
+        """
+        Stop the reloader thread and wait for it to finish.
+        """
+        reloader = self.__reloader
+        if reloader is not None:
+            reloader.stopped.set()
+            if reloader.pid == os.getpid():
+                reloader.join()
+            self.__reloader = None
+
+
+default_holder = CheckerHolder(SettingsSource())
+
+
+@receiver(setting_changed)
+def _reset_checker(sender, setting, **kwargs):
+    """
+    Drop the checker of `default_holder` when `REGISTRATION_NAMES` setting
+    changes.
+    """
+    if setting in (ROOT_CONFIG, SNAPSHOT_CONFIG):
+        default_holder.clear()
@@ -0,0 +1,205 @@
+"""
+Check usernames of existing users against `REGISTRATION_NAMES` setting.
+"""
+from __future__ import absolute_import
+
+import collections
+import csv
+import io
+import json
+import multiprocessing
+import time
+from optparse import make_option
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import six
+
+from registration_names.checkers import get_checker
+
+
+def _init_worker():
+    """
+    Build the checker once per worker process.
+    """
+    get_checker()
+
+
+def _check_chunk(chunk):
+    """
+    Check a chunk of usernames.
+
+    Returns the number of checked usernames and the list of
+    `(username, rule)` tuples for not allowed ones.
+    """
+    checker = get_checker()
+    violators = [(value, rule)
+                 for value, allowed, rule in checker.check_many(chunk,
+                                                                len(chunk))
+                 if not allowed]
+    return len(chunk), violators
+
+
+def _username_chunks(chunk_size):
+    """
+    Generate lists of usernames of all users, `chunk_size` at most each.
+
+    The table is paged through by primary keys, so every chunk is a short
+    indexed query and all usernames are never fetched at once.
+    """
+    last_pk = None
+    while True:
+        users = User.objects.order_by('pk')
+        if last_pk is not None:
+            users = users.filter(pk__gt=last_pk)
+        page = list(users.values_list('pk', 'username')[:chunk_size])
+        if not page:
+            return
+        last_pk = page[-1][0]
+        yield [username for _, username in page]
+
+
+def _map_in_order(pool, func, iterable, window):
+    """
+    Like `pool.imap`, but consumes `iterable` in the calling thread, so
+    database queries run on its connection, and keeps at most `window` items
+    in flight.
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _format_rule(rule):
+    """
+    Represent the rule which rejected a username as a string.
+    """
+    if rule is None:
+        return ''
+    if isinstance(rule, six.string_types):
+        return rule
+    return json.dumps(list(rule))
+
+
+class Command(BaseCommand):
+    help = ("Check usernames of existing users against REGISTRATION_NAMES "
+            "setting and report not allowed ones.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int',
+                    default=multiprocessing.cpu_count(),
+                    help="Number of worker processes. Default: the number "
+                         "of CPUs."),
+        make_option('--chunk-size', type='int', dest='chunk_size',
+                    default=10000,
+                    help="Number of usernames sent to a worker at once. "
+                         "Default: 10000."),
+        make_option('--format', choices=['csv', 'jsonl'], default='csv',
+                    help="Output format: 'csv' or 'jsonl'. Default: 'csv'."),
+        make_option('--output',
+                    help="File to write not allowed usernames to. "
+                         "Default: standard output."),
+        make_option('--progress-every', type='int', dest='progress_every',
+                    default=100000,
+                    help="Report progress every N usernames. "
+                         "0 disables the report. Default: 100000."),
+    )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        if workers < 1:
+            raise CommandError("--workers must be positive.")
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        # Fail early on a misconfiguration, workers would inherit the checker
+        # on platforms which fork.
+        get_checker()
+        # Rules from the database open a connection, which forked workers
+        # mustn't share.
+        for connection in connections.all():
+            connection.close()
+
+        if options['output']:
+            if six.PY2:
+                output = open(options['output'], 'wb')
+            else:
+                output = io.open(options['output'], 'w', encoding='utf-8',
+                                 newline='')
+        else:
+            output = self.stdout
+        write = self._get_writer(output, options['format'])
+
+        # The pool is started before the database is queried, so workers
+        # don't inherit an open connection.
+        pool = None
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, _init_worker)
+        try:
+            chunks = _username_chunks(chunk_size)
+            if pool is not None:
+                results = _map_in_order(pool, _check_chunk, chunks,
+                                        workers * 2)
+            else:
+                results = six.moves.map(_check_chunk, chunks)
+            checked, violated = self._write_results(
+                results, write, options['progress_every'])
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            if options['output']:
+                output.close()
+
+        self.stderr.write("Checked {} usernames, {} not allowed.\n".format(
+            checked, violated))
+
+    def _get_writer(self, output, output_format):
+        """
+        Return a function writing a not allowed username and its rule.
+        """
+        if output_format == 'jsonl':
+            def write(username, rule):
+                output.write(json.dumps(
+                    {'username': username, 'rule': rule}) + '\n')
+            return write
+
+        writer = csv.writer(output)
+
+        def write(username, rule):
+            row = [username, _format_rule(rule)]
+            if six.PY2:
+                row = [c.encode('utf-8') for c in row]
+            writer.writerow(row)
+        return write
+
+    def _write_results(self, results, write, progress_every):
+        """
+        Write results of workers and report progress.
+
+        Returns the number of checked and not allowed usernames.
+        """
+        started = time.time()
+        checked = 0
+        violated = 0
+        reported = 0
+        for chunk_len, violators in results:
+            for username, rule in violators:
+                write(username, rule)
+            checked += chunk_len
+            violated += len(violators)
+
+            if progress_every and checked - reported >= progress_every:
+                reported = checked
+                elapsed = time.time() - started
+                self.stderr.write(
+                    "Checked {} usernames, {} not allowed, "
+                    "{:.0f} usernames/s.\n".format(
+                        checked, violated, checked / max(elapsed, 1e-9)))
+        return checked, violated
@@ -0,0 +1,45 @@
+"""
+Convert a text file with names into the compact sorted format.
+"""
+from __future__ import absolute_import
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from registration_names import namefiles
+from registration_names.canonical import canonicalize
+
+
+class Command(BaseCommand):
+    args = '<input> <output>'
+    help = ("Convert a text file with one name per line into the compact "
+            "sorted file which can be memory mapped by the checker.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--canonical', action='store_true', default=False,
+                    help="Store canonical forms of names, for lists listed "
+                         "in 'canonical' key of REGISTRATION_NAMES."),
+        make_option('--error-rate', type='float', default=None,
+                    help="Store a Bloom filter of names with this "
+                         "false-positive rate (e.g. 0.01), so most names "
+                         "which aren't in the file are rejected without "
+                         "searching it."),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError("Input and output files are expected.")
+        input_path, output_path = args
+
+        try:
+            names = namefiles.read_text_names(input_path)
+            if options['canonical']:
+                names = [canonicalize(n) for n in names]
+            namefiles.write_sorted_names(names, output_path,
+                                         options['error_rate'])
+        except (IOError, OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write("Written {} names to '{}'.\n".format(
+            len(namefiles.SortedNameFile(output_path)), output_path))
@@ -0,0 +1,36 @@
+"""
+Build a snapshot of the checker for `REGISTRATION_NAMES` setting.
+"""
+from __future__ import absolute_import
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from registration_names.checkers import ROOT_CONFIG, SNAPSHOT_CONFIG, Checker
+from registration_names.holders import prepare_root
+from registration_names.snapshots import save_snapshot
+
+
+class Command(BaseCommand):
+    args = '[<path>]'
+    help = ("Build the checker for REGISTRATION_NAMES setting and save its "
+            "snapshot to the path (REGISTRATION_NAMES_SNAPSHOT setting by "
+            "default).")
+
+    def handle(self, *args, **options):
+        if len(args) > 1:
+            raise CommandError("Only the path of the snapshot is expected.")
+        path = args[0] if args else getattr(settings, SNAPSHOT_CONFIG, None)
+        if not path:
+            raise CommandError(
+                "The path isn't given and {} setting isn't set.".format(
+                    SNAPSHOT_CONFIG))
+
+        root = getattr(settings, ROOT_CONFIG, None)
+        started = time.time()
+        checker = Checker(prepare_root(root))
+        save_snapshot(checker, root, path)
+        self.stdout.write("Snapshot saved to '{}' in {:.2f} s.\n".format(
+            path, time.time() - started))
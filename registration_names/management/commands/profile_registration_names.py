@@ -0,0 +1,68 @@
+"""
+Rank rules of `REGISTRATION_NAMES` setting by the cost of matching them.
+"""
+from __future__ import absolute_import
+
+import io
+from optparse import make_option
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from registration_names.checkers import get_checker
+
+
+class Command(BaseCommand):
+    help = ("Run a sample of usernames through Checker.explain and rank "
+            "rules by cumulative matching time.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--sample', type='int', default=1000,
+                    help="Number of randomly chosen usernames of existing "
+                         "users (or the first usernames of --file) to "
+                         "check. Default: 1000."),
+        make_option('--file',
+                    help="Check usernames from this file (one per line) "
+                         "instead of existing users."),
+        make_option('--top', type='int', default=20,
+                    help="Number of the most expensive rules to show. "
+                         "Default: 20."),
+    )
+
+    def handle(self, *args, **options):
+        if options['sample'] < 1:
+            raise CommandError("--sample must be positive.")
+
+        if options['file']:
+            try:
+                with io.open(options['file'], encoding='utf-8') as f:
+                    usernames = [line.rstrip(u'\r\n') for line in f]
+            except (IOError, OSError, ValueError) as e:
+                raise CommandError(str(e))
+            usernames = [u for u in usernames if u][:options['sample']]
+        else:
+            usernames = list(User.objects.order_by('?').values_list(
+                'username', flat=True)[:options['sample']])
+
+        checker = get_checker()
+        # Cumulative time, maximum time and number of matches by rule.
+        costs = {}
+        for username in usernames:
+            for r in checker.explain(username)['rules']:
+                key = (r['list_name'], r['rule_index'])
+                total_ns, max_ns, matches, rule = costs.get(
+                    key, (0, 0, 0, r['rule']))
+                costs[key] = (total_ns + r['elapsed_ns'],
+                              max(max_ns, r['elapsed_ns']),
+                              matches + int(r['matched']),
+                              rule)
+
+        self.stdout.write("Checked {} usernames.\n".format(len(usernames)))
+        self.stdout.write("{:>12} {:>10} {:>8}  {}\n".format(
+            "total, us", "max, us", "matches", "rule"))
+        ranked = sorted(costs.items(), key=lambda item: -item[1][0])
+        for (list_name, index), (total_ns, max_ns, matches, rule) in \
+                ranked[:options['top']]:
+            self.stdout.write("{:12.1f} {:10.1f} {:8}  {}[{}]: {!r}\n".format(
+                total_ns / 1000.0, max_ns / 1000.0, matches,
+                list_name, index, rule))
@@ -0,0 +1,76 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import six
+from django.utils.translation import ugettext_lazy as _
+
+from registration_names.checkers import Checker
+
+
+class ReservedName(models.Model):
+    """
+    A rule of 'allowed' or 'prohibited' list stored in the database.
+
+    Rules are added to the lists from `REGISTRATION_NAMES` setting when it
+    has 'database' key set to True.
+    """
+
+    LIST_ALLOWED = 'allowed'
+    LIST_PROHIBITED = 'prohibited'
+    LIST_CHOICES = (
+        (LIST_ALLOWED, _("Allowed")),
+        (LIST_PROHIBITED, _("Prohibited")),
+    )
+
+    KIND_STR = 'str'
+    KIND_RE = 're'
+    KIND_CHOICES = (
+        (KIND_STR, _("Name")),
+        (KIND_RE, _("Regular expression")),
+    )
+
+    list_name = models.CharField(_("list"), max_length=16,
+                                 choices=LIST_CHOICES)
+    kind = models.CharField(_("kind"), max_length=8, choices=KIND_CHOICES,
+                            default=KIND_STR)
+    pattern = models.CharField(_("pattern"), max_length=255)
+    flags = models.CharField(_("flags"), max_length=8, blank=True,
+                             help_text=_("'i' for case insensitivity."))
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = _("reserved name")
+        verbose_name_plural = _("reserved names")
+
+    def __unicode__(self):
+        return self.pattern
+
+    if six.PY3:
+        __str__ = __unicode__
+
+    def as_element(self):
+        """
+        Return the rule as an element of a list in `REGISTRATION_NAMES`.
+        """
+        if self.kind == self.KIND_RE:
+            return ('re', self.flags, self.pattern)
+        return self.pattern
+
+    def clean(self):
+        try:
+            Checker({
+                'control_type': self.list_name,
+                self.list_name: [self.as_element()],
+            })
+        except (ImproperlyConfigured, re.error) as e:
+            raise ValidationError(str(e))
+
+
+@receiver(post_save, sender=ReservedName)
+@receiver(post_delete, sender=ReservedName)
+def _bump_rules_version(sender, **kwargs):
+    from registration_names.store import bump_version_on_commit
+    bump_version_on_commit(kwargs.get('using'))
@@ -0,0 +1,155 @@
+"""
+Files with lists of names.
+
+Two formats are supported:
+* Text files with one name per line in UTF-8. Empty lines are skipped.
+* Compact sorted files made by `write_sorted_names` (or
+`build_registration_names_file` management command). Such files are memory
+mapped and searched with binary search, so names are not loaded into memory
+and forked processes share the same pages. They may contain a Bloom filter
+of the names (see `registration_names.bloom`) checked before the search.
+"""
+import io
+import mmap
+import os
+import struct
+import threading
+
+from django.utils import six
+
+from registration_names.bloom import BloomFilter
+
+
+MAGIC = b'RGNAMES1'
+# The format with a Bloom filter.
+MAGIC_FILTERED = b'RGNAMES2'
+
+# The header is the magic and the number of names. It's followed by
+# (count + 1) offsets of names in the data section and the data section with
+# sorted UTF-8 encoded names.
+_HEADER = struct.Struct('<8sQ')
+# With MAGIC_FILTERED the header is followed by the number of bits and hash
+# functions of the filter and the filter itself, then by offsets and data.
+_FILTER_HEADER = struct.Struct('<QQ')
+_OFFSET = struct.Struct('<Q')
+_BOUNDS = struct.Struct('<QQ')
+
+
+def _encode(value):
+    if isinstance(value, six.text_type):
+        return value.encode('utf-8')
+    return value
+
+
+def is_sorted_file(path):
+    """
+    Determine if the file is in the compact sorted format.
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) in (MAGIC, MAGIC_FILTERED)
+
+
+def read_text_names(path):
+    """
+    Read names from a text file, one name per line.
+    """
+    with io.open(path, encoding='utf-8') as f:
+        return [line.rstrip(u'\r\n') for line in f if line.rstrip(u'\r\n')]
+
+
+def write_sorted_names(names, path, error_rate=None):
+    """
+    Write names to a file in the compact sorted format.
+
+    `error_rate` - the false-positive rate of the Bloom filter of the names
+    to store in the file. The filter isn't stored when it's None.
+
+    The file is written to a temporary file first and then renamed, so
+    processes which have the old file mapped aren't affected.
+    """
+    names = sorted(set(_encode(n) for n in names))
+
+    # Unique, processes may write the same file at once.
+    tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(),
+                                     threading.current_thread().ident)
+    with open(tmp_path, 'wb') as f:
+        if error_rate is None:
+            f.write(_HEADER.pack(MAGIC, len(names)))
+        else:
+            bloom = BloomFilter.build(names, error_rate)
+            f.write(_HEADER.pack(MAGIC_FILTERED, len(names)))
+            f.write(_FILTER_HEADER.pack(bloom.bits, bloom.hashes))
+            f.write(bloom.as_bytes())
+        offset = 0
+        f.write(_OFFSET.pack(offset))
+        for n in names:
+            offset += len(n)
+            f.write(_OFFSET.pack(offset))
+        for n in names:
+            f.write(n)
+    os.rename(tmp_path, path)
+
+
+class SortedNameFile(object):
+    """
+    Memory mapped file in the compact sorted format.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor.
+
+        `path` - the path of the file.
+
+        Raises ValueError if the file isn't in the compact sorted format.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.__mmap) < _HEADER.size:
+            raise ValueError("The file is too short.")
+        magic, self.__count = _HEADER.unpack_from(self.__mmap, 0)
+        if magic not in (MAGIC, MAGIC_FILTERED):
+            raise ValueError("Unknown file format.")
+
+        self.__offsets = _HEADER.size
+        self.bloom = None
+        if magic == MAGIC_FILTERED:
+            start = _HEADER.size + _FILTER_HEADER.size
+            if len(self.__mmap) < start:
+                raise ValueError("The file is truncated.")
+            bits, hashes = _FILTER_HEADER.unpack_from(
+                self.__mmap, _HEADER.size)
+            self.bloom = BloomFilter(self.__mmap, start, bits, hashes)
+            self.__offsets = start + bits // 8
+        self.__data = self.__offsets + (self.__count + 1) * _OFFSET.size
+        if len(self.__mmap) < self.__data:
+            raise ValueError("The file is truncated.")
+
+    def __reduce__(self):
+        # Pickled as the path, the file is mapped again when unpickled.
+        return (SortedNameFile, (self.path,))
+
+    def __len__(self):
+        return self.__count
+
+    def __contains__(self, value):
+        key = _encode(value)
+        if self.bloom is not None and key not in self.bloom:
+            return False
+        mm = self.__mmap
+        lo = 0
+        hi = self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = _BOUNDS.unpack_from(
+                mm, self.__offsets + mid * _OFFSET.size)
+            name = mm[self.__data + start:self.__data + end]
+            if name < key:
+                lo = mid + 1
+            elif name > key:
+                hi = mid
+            else:
+                return True
+        return False
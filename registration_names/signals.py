@@ -0,0 +1,16 @@
+from django.dispatch import Signal
+
+
+# Sent after every check of a checker with 'instrument' key set to True.
+#
+# `checker` - the checker.
+# `username` - the checked name.
+# `allowed` - the result of the check.
+# `list_name` - the list which decided the result ('allowed' or 'prohibited')
+# or None if no list did.
+# `rule` - the element of the list which decided the result or None.
+# `rule_index` - the position of `rule` in the list or None.
+# `elapsed_ns` - the duration of the check in nanoseconds.
+name_checked = Signal(providing_args=[
+    'checker', 'username', 'allowed', 'list_name', 'rule', 'rule_index',
+    'elapsed_ns'])
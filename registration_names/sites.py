@@ -0,0 +1,195 @@
+"""
+Rules of many sites served by one project.
+
+`REGISTRATION_NAMES_SITES` setting maps sites to their configuration
+dictionaries in the format of `REGISTRATION_NAMES`. Sites are keyed by
+`Site` ids or domains (with `django.contrib.sites`) or by request hosts:
+
+    REGISTRATION_NAMES_SITES = {
+        'shop.example.com': {
+            'control_type': 'prohibited',
+            'prohibited': ['orders', 'cart'],
+        },
+    }
+
+`REGISTRATION_NAMES` holds the base rules shared by all sites. A name is
+allowed on a site only if it's allowed both by the base rules and by the
+site's rules. The base checker is built once, site checkers contain site
+rules only and are kept in a pool of `REGISTRATION_NAMES_POOL_SIZE` (100 by
+default) recently used ones.
+"""
+import collections
+import threading
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from registration_names.checkers import Checker
+from registration_names.holders import default_holder, prepare_root
+
+
+SITES_CONFIG = 'REGISTRATION_NAMES_SITES'
+POOL_SIZE_CONFIG = 'REGISTRATION_NAMES_POOL_SIZE'
+DEFAULT_POOL_SIZE = 100
+
+# The pool of site checkers, made on first use.
+_pool = None
+# Subclasses of forms by form classes and site keys, made on first use.
+_form_classes = {}
+
+
+class LayeredChecker(object):
+    """
+    The checker which allows names allowed by all its checkers.
+    """
+
+    def __init__(self, checkers):
+        self.checkers = tuple(checkers)
+
+    def check(self, value):
+        for checker in self.checkers:
+            if not checker.check(value):
+                return False
+        return True
+
+
+class CheckerPool(object):
+    """
+    Bounded pool of checkers by site keys which drops least recently used
+    ones.
+    """
+
+    def __init__(self, max_size):
+        self.__max_size = max_size
+        # Site keys and tuples of the configuration dictionary and the
+        # checker built from it.
+        self.__data = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def get(self, key, root):
+        """
+        Return the checker of the site `key` built from the configuration
+        dictionary `root`.
+
+        The checker is built again if `root` isn't the object the pooled one
+        is built from.
+        """
+        with self.__lock:
+            entry = self.__data.pop(key, None)
+            if entry is not None and entry[0] is root:
+                # Move to the most recently used end.
+                self.__data[key] = entry
+                return entry[1]
+
+        # Built without the lock, checks of other sites don't wait.
+        checker = Checker(prepare_root(root))
+        with self.__lock:
+            self.__data[key] = (root, checker)
+            while len(self.__data) > self.__max_size:
+                self.__data.popitem(last=False)
+        return checker
+
+
+def _get_pool():
+    global _pool
+
+    pool = _pool
+    if pool is None:
+        pool = _pool = CheckerPool(
+            getattr(settings, POOL_SIZE_CONFIG, DEFAULT_POOL_SIZE))
+    return pool
+
+
+def _request_keys(request):
+    """
+    Generate possible keys of the site of the request.
+    """
+    if 'django.contrib.sites' in getattr(settings, 'INSTALLED_APPS', ()):
+        try:
+            from django.contrib.sites.shortcuts import get_current_site
+        except ImportError:
+            # Django < 1.7.
+            from django.contrib.sites.models import get_current_site
+        site = get_current_site(request)
+        yield site.id
+        yield site.domain
+    yield request.get_host().split(':')[0]
+
+
+def get_site_key(request):
+    """
+    Return the key of the site of the request in `REGISTRATION_NAMES_SITES`
+    setting or None if the site has no own rules.
+    """
+    sites = getattr(settings, SITES_CONFIG, None)
+    if not sites:
+        return None
+    for key in _request_keys(request):
+        if key in sites:
+            return key
+    return None
+
+
+def get_site_checker(key):
+    """
+    Return the checker of the site `key` of `REGISTRATION_NAMES_SITES`
+    setting layered over the base checker, or the base checker if the site
+    has no own rules.
+    """
+    base = default_holder.get()
+    if key is None:
+        return base
+    root = (getattr(settings, SITES_CONFIG, None) or {}).get(key)
+    if root is None:
+        return base
+    return LayeredChecker([base, _get_pool().get(key, root)])
+
+
+class SiteHolder(object):
+    """
+    The holder of the checker of a site for forms (see
+    `NameControlMixin.checker_holder`).
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        return get_site_checker(self.key)
+
+
+def get_form_class(form_class, request):
+    """
+    Return the subclass of `form_class` with `NameControlMixin` which checks
+    names with the rules of the site of the request, or `form_class` itself
+    if the site has no own rules.
+    """
+    key = get_site_key(request)
+    if key is None:
+        return form_class
+    site_class = _form_classes.get((form_class, key))
+    if site_class is None:
+        site_class = type(form_class.__name__, (form_class,), {
+            'checker_holder': SiteHolder(key),
+            '__module__': form_class.__module__,
+        })
+        # Concurrent requests may make a class each, one is kept.
+        site_class = _form_classes.setdefault((form_class, key), site_class)
+    return site_class
+
+
+@receiver(setting_changed)
+def _reset_pool(sender, setting, **kwargs):
+    """
+    Drop the pool and the form classes when the sites or the pool size
+    settings change.
+    """
+    global _pool
+
+    if setting in (SITES_CONFIG, POOL_SIZE_CONFIG):
+        _pool = None
+        _form_classes.clear()
@@ -0,0 +1,116 @@
+"""
+Snapshots of built checkers.
+
+Building a checker for a big configuration validates every rule and
+compiles regexps. A snapshot is a pickled built checker, so processes
+can load it instead, e.g. on start of every web server worker. Snapshots
+are made by `build_registration_names_snapshot` management command and used
+by `get_checker` when `REGISTRATION_NAMES_SNAPSHOT` setting is set to the
+path of the snapshot.
+
+The snapshot stores the fingerprint of the configuration it's built from,
+including modification times and sizes of name files, and isn't used when
+the configuration or the files have changed. Memory mapped name files are
+mapped again when the snapshot is loaded, text name files are stored in the
+snapshot. Regexps are recompiled by `pickle` while loading.
+
+Snapshots are pickles: load only snapshots you have made yourself.
+"""
+import hashlib
+import os
+import pickle
+import warnings
+
+from registration_names import VERSION
+from registration_names.checkers import URLS_KEY
+
+
+SNAPSHOT_FORMAT = 3
+
+
+def _file_stats(root):
+    """
+    Return the list of paths, modification times and sizes of name files
+    referenced by ('file', path) elements of the configuration dictionary.
+    """
+    result = []
+    for _, value in sorted(root.items()):
+        if not isinstance(value, (list, tuple)):
+            continue
+        for element in value:
+            if (isinstance(element, (list, tuple)) and len(element) == 2 and
+                    element[0] == 'file'):
+                try:
+                    st = os.stat(element[1])
+                except (OSError, TypeError):
+                    # The checker reports missing files.
+                    result.append((element[1], None))
+                else:
+                    result.append((element[1], st.st_mtime, st.st_size))
+    return result
+
+
+def fingerprint(root):
+    """
+    Return the fingerprint of a configuration dictionary, the name files it
+    references and names of the URLconf when 'prohibit_urls' key is set.
+    """
+    files = []
+    url_names = None
+    if isinstance(root, dict):
+        files = _file_stats(root)
+        if root.get(URLS_KEY):
+            # Added by `prepare_root`, they change with the URLconf.
+            from registration_names.backends.utils import get_url_names
+            url_names = get_url_names()
+        root = sorted(root.items())
+    return hashlib.sha1(
+        repr((root, files, url_names)).encode('utf-8')).hexdigest()
+
+
+def save_snapshot(checker, root, path):
+    """
+    Save a snapshot of the checker built from the configuration `root`.
+
+    The snapshot is written to a temporary file first and then renamed, so
+    processes never load a partially written snapshot.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({
+            'format': SNAPSHOT_FORMAT,
+            'version': VERSION,
+            'fingerprint': fingerprint(root),
+            'checker': checker,
+        }, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_path, path)
+
+
+def load_snapshot(root, path):
+    """
+    Load the checker from a snapshot made for the configuration `root`.
+
+    Returns None and warns if the snapshot can't be loaded or was made for
+    another configuration or version of the application.
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        warnings.warn("Can't load snapshot '{}': {}".format(path, e),
+                      RuntimeWarning)
+        return None
+
+    if (not isinstance(snapshot, dict) or
+            snapshot.get('format') != SNAPSHOT_FORMAT or
+            snapshot.get('version') != VERSION):
+        warnings.warn("Snapshot '{}' was made by another version, "
+                      "rebuild it.".format(path), RuntimeWarning)
+        return None
+
+    if snapshot['fingerprint'] != fingerprint(root):
+        warnings.warn("Snapshot '{}' was made for another configuration, "
+                      "rebuild it.".format(path), RuntimeWarning)
+        return None
+
+    return snapshot['checker']
@@ -0,0 +1,108 @@
+"""
+Rules stored in the database.
+
+The checker with database rules is kept per process together with the
+version of the rules (see `registration_names.holders`). The version is kept
+in Django cache and bumped on every change of `ReservedName`, so processes
+rebuild their checkers only after a change and a check costs one cache lookup.
+
+Changes are bumped once they are committed: a process rebuilding its checker
+from the rules read before the commit would keep it under the new version.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import transaction
+from django.dispatch import receiver
+
+
+VERSION_CACHE_KEY = 'registration_names:version'
+# The version is kept until it's evicted: once it expires all processes
+# rebuild their checkers. Django < 1.6 takes None for the default timeout.
+VERSION_TIMEOUT = 10 * 365 * 24 * 60 * 60
+
+
+def _new_version():
+    # Start from a unique value, so a version expired or evicted from the cache
+    # isn't mistaken for an older one.
+    return int(time.time() * 1000000)
+
+
+def get_version():
+    """
+    Return the current version of the rules.
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, _new_version(), VERSION_TIMEOUT)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """
+    Mark the rules as changed.
+    """
+    # Not `cache.incr()`: backends other than memcached store the result
+    # with the default timeout. Versions are only compared for equality.
+    cache.set(VERSION_CACHE_KEY, _new_version(), VERSION_TIMEOUT)
+
+
+# Whether the version must be bumped again at the end of the request, see
+# `bump_version_on_commit`.
+_pending = threading.local()
+
+
+def _in_transaction(using):
+    try:
+        # Django >= 1.6.
+        return transaction.get_connection(using).in_atomic_block
+    except AttributeError:
+        return transaction.is_managed(using)
+
+
+def bump_version_on_commit(using=None):
+    """
+    Mark the rules as changed once the current transaction of the database
+    `using` is committed.
+
+    Django < 1.9 has no commit hooks: the version is bumped at once and, in a
+    transaction, again at the end of the request, so checkers built from the
+    rules read before the commit are rebuilt then.
+    """
+    on_commit = getattr(transaction, 'on_commit', None)
+    if on_commit is not None:
+        on_commit(bump_version, using=using)
+        return
+    bump_version()
+    if _in_transaction(using):
+        _pending.bump = True
+
+
+@receiver(request_finished)
+def _bump_pending(sender, **kwargs):
+    if getattr(_pending, 'bump', False):
+        _pending.bump = False
+        bump_version()
+
+
+def load_root(root):
+    """
+    Return a copy of the configuration dictionary with database rules added
+    to its lists.
+    """
+    from registration_names.models import ReservedName
+
+    rules = {}
+    for rule in ReservedName.objects.order_by('id'):
+        rules.setdefault(rule.list_name, []).append(rule.as_element())
+
+    root = dict(root)
+    for list_name, elements in rules.items():
+        current = root.get(list_name, [])
+        # Leave incorrect values for the checker to report.
+        if isinstance(current, (list, tuple)):
+            root[list_name] = list(current) + elements
+    return root
@@ -1,14 +1,38 @@
+# -*- coding: utf-8 -*-
+import io
+import json
 import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import warnings
 sys.path.append(os.getcwd())
 os.environ['DJANGO_SETTINGS_MODULE'] = 'registration_names.settings'
 
 from unittest import TestCase
 
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.conf.urls import url
+from django.core.urlresolvers import RegexURLPattern, RegexURLResolver
+from django.utils import six
+from django import test as django_test
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
 #from django.conf import settings
 
 from checkers import Checker
+import forms
+import holders
+from backends import utils as backends_utils
+import namefiles
+import sites
+import snapshots
+from registration_names.signals import name_checked
 
 
 class IncorrectConfigTests(TestCase):
@@ -314,3 +338,1338 @@ class CorrectConfigTests(TestCase):
         self.assertEqual(c.check("sTrange"), False)
         self.assertEqual(c.check("strange"), True)
         self.assertEqual(c.check("STRANGE"), True)
+
+    def test_many_strings(self):
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': ['name{}'.format(i) for i in range(10000)] + [
+                'name0',  # Duplicate.
+            ]
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("name0"), False)
+        self.assertEqual(c.check("name9999"), False)
+        self.assertEqual(c.check("name10000"), True)
+        self.assertEqual(c.check("Name0"), True)
+
+    def test_combined_patterns(self):
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': [
+                ('re', '', 'admin'),
+                ('re', '', 'root$'),
+                ('re', 'i', 'support_.*'),
+                ('re', 'i', 'staff'),
+                # Can't be joined with others.
+                ('re', '', r'(.)\1'),
+                ('re', '', '(?P<a>x)yz'),
+                ('re', '', '(?P<a>y)zx'),
+                ('re', '', '(?i)case'),
+            ]
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("administrator"), False)
+        self.assertEqual(c.check("Admin"), True)
+        self.assertEqual(c.check("root"), False)
+        self.assertEqual(c.check("rooted"), True)
+        self.assertEqual(c.check("SUPPORT_1"), False)
+        self.assertEqual(c.check("sTaFf"), False)
+        self.assertEqual(c.check("aab"), False)
+        self.assertEqual(c.check("abb"), True)
+        self.assertEqual(c.check("xyz"), False)
+        self.assertEqual(c.check("yzx"), False)
+        self.assertEqual(c.check("CASE"), False)
+        self.assertEqual(c.check("user"), True)
+
+        # The first matching regexp of the list is reported.
+        root['prohibited'] = [
+            ('re', 'i', '[b]+'),
+            ('re', '', '[a].*'),
+            ('re', '', r'(.)\1'),
+            ('re', '', '[x]'),
+            ('re', 'i', '[a]+b'),
+        ]
+        c = Checker(root)
+        self.assertEqual(list(c.check_many(["aab", "xx", "AAB"])), [
+            ("aab", False, ('re', '', '[a].*')),
+            ("xx", False, ('re', '', r'(.)\1')),
+            ("AAB", False, ('re', '', r'(.)\1')),
+        ])
+
+    def test_check_many(self):
+        root = {
+            'control_type': 'allowed_and_prohibited',
+            'allowed': [
+                'Explicit name.',
+                ('re', '', 'pA+ttern'),
+                ('re', 'i', 'sTrAnGe'),
+            ],
+            'prohibited': [
+                'pAAttern',
+                ('re', '', 'sT.*')
+            ]
+        }
+        c = Checker(root)
+        values = ["not allowed", "Explicit name.", "pAttern", "pAAttern",
+                  "sTrange", "strange"]
+        expected = [
+            ("not allowed", False, None),
+            ("Explicit name.", True, "Explicit name."),
+            ("pAttern", True, ('re', '', 'pA+ttern')),
+            ("pAAttern", False, "pAAttern"),
+            ("sTrange", False, ('re', '', 'sT.*')),
+            ("strange", True, ('re', 'i', 'sTrAnGe')),
+        ]
+        self.assertEqual(list(c.check_many(iter(values), chunk_size=4)),
+                         expected)
+        self.assertEqual([a for _, a, _ in c.check_many(values)],
+                         [c.check(v) for v in values])
+
+        c = Checker({'control_type': 'disabled'})
+        self.assertEqual(list(c.check_many(["name"])), [("name", True, None)])
+
+    def test_prefixes(self):
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': [
+                ('re', 'i', 'admin.*'),
+                ('re', '', 'support_.*'),
+                ('re', '', r'staff\.'),
+                ('re', '', r'dot\.*x'),  # Not a prefix.
+                ('re', '', r'\d+'),  # Not a prefix.
+                ('re', 'i', u'дем.*'),  # Not ASCII.
+            ]
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.check("AdMiNistrator"), False)
+        # Non-ASCII values are matched as re.I does, which folds non-ASCII
+        # characters on Python 3 only.
+        self.assertEqual(c.check(u"admİn"),
+                         re.match(u'admin.*', u"admİn", re.I) is None)
+        self.assertEqual(c.check(u"Kadmin"), True)
+        self.assertEqual(c.check("adm"), True)
+        self.assertEqual(c.check("support_team"), False)
+        self.assertEqual(c.check("Support_team"), True)
+        self.assertEqual(c.check("staff.1"), False)
+        self.assertEqual(c.check("staffx"), True)
+        self.assertEqual(c.check("dot...x"), False)
+        self.assertEqual(c.check("dotx"), False)
+        self.assertEqual(c.check("dot"), True)
+        self.assertEqual(c.check("123"), False)
+        self.assertEqual(c.check(u"ДЕМо"),
+                         re.match(u'дем.*', u"ДЕМо", re.I) is None)
+
+        # Everything starts with an empty prefix.
+        c = Checker({'control_type': 'prohibited',
+                     'prohibited': [('re', '', '.*')]})
+        self.assertEqual(c.check("anything"), False)
+        self.assertEqual(c.check(""), False)
+
+    def test_prefixes_case_folding(self):
+        # KELVIN SIGN matches 'k' when case is ignored on Python 3.
+        c = Checker({'control_type': 'prohibited',
+                     'prohibited': [('re', 'i', 'kk')]})
+        self.assertEqual(c.check(u"kK"),
+                         re.match(u'kk', u"kK", re.I) is None)
+        self.assertEqual(c.check(u"kxK"), True)
+
+    def test_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        sorted_path = os.path.join(tmp_dir, 'names.bin')
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u"first\n\nsecond\r\n")
+        namefiles.write_sorted_names(
+            [u'name{}'.format(i) for i in range(1000)] + [u'имя'],
+            sorted_path)
+
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': [
+                ('file', text_path),
+                ('file', sorted_path),
+            ]
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("first"), False)
+        self.assertEqual(c.check("second"), False)
+        self.assertEqual(c.check(""), True)
+        self.assertEqual(c.check("name0"), False)
+        self.assertEqual(c.check("name999"), False)
+        self.assertEqual(c.check(u"имя"), False)
+        self.assertEqual(c.check("name1000"), True)
+        self.assertEqual(c.check("name"), True)
+        self.assertEqual(list(c.check_many(["name5"])),
+                         [("name5", False, ('file', sorted_path))])
+
+        with self.assertRaises(ImproperlyConfigured):
+            Checker({
+                'control_type': 'prohibited',
+                'prohibited': [('file', os.path.join(tmp_dir, 'missing'))]
+            })
+
+    def test_filtered_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'names.bin')
+        names = [u'name{}'.format(i) for i in range(10000)] + [u'имя']
+        namefiles.write_sorted_names(names, path, error_rate=0.01)
+
+        f = namefiles.SortedNameFile(path)
+        self.assertEqual(len(f), len(names))
+        self.assertEqual(f.bloom.bits, 95864)
+        for name in names:
+            self.assertIn(name, f)
+        self.assertNotIn(u'name10000', f)
+        others = [u'other{}'.format(i) for i in range(10000)]
+        false_positives = sum(1 for n in others if n in f.bloom)
+        self.assertLess(false_positives, 200)
+
+        c = Checker({'control_type': 'prohibited',
+                     'prohibited': [('file', path)]})
+        self.assertEqual(c.check(u"имя"), False)
+        self.assertEqual(c.check(u"other1"), True)
+
+        with self.assertRaises(ValueError):
+            namefiles.write_sorted_names(names, path, error_rate=1)
+
+    def test_near(self):
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': [
+                ('near', 1, 'admin'),
+                ('near', 2, 'support'),
+                ('near', 1, 'paypal'),
+            ],
+        }
+        c = Checker(root)
+        for name in ["admin", "adm1n", "admins", "dmin", "suppport", "supp",
+                     "paypa1", "sup-port"]:
+            self.assertEqual(c.check(name), name == "supp", name)
+        self.assertEqual(c.check("adm11n"), True)
+        self.assertEqual(c.check("administrator"), True)
+        self.assertEqual(c.explain("supprt")['rule_index'], 1)
+        self.assertEqual([r['matched'] for r in c.explain("admn")['rules']],
+                         [True, False, False])
+
+        c.remove_rule('prohibited', 0)
+        self.assertEqual(c.check("adm1n"), True)
+
+        # Long values are rejected by length without generating deletions.
+        c = Checker({'control_type': 'prohibited',
+                     'prohibited': [('near', 3, 'admin')]})
+        checkers_module = sys.modules[Checker.__module__]
+        deletions = checkers_module._deletions
+        generated = []
+
+        def record_deletions(value, distance):
+            generated.append(value)
+            return deletions(value, distance)
+
+        checkers_module._deletions = record_deletions
+        self.addCleanup(setattr, checkers_module, '_deletions', deletions)
+        self.assertEqual(c.check("a" * 1000), True)
+        self.assertEqual(c.check("admin1234"), True)
+        self.assertEqual(generated, [])
+        self.assertEqual(c.check("admin123"), False)
+        self.assertEqual(generated, ["admin123"])
+
+        c = Checker({'control_type': 'prohibited',
+                     'canonical': ['prohibited'],
+                     'prohibited': [('near', 1, 'Admin')]})
+        self.assertEqual(c.check(u"АDMlN"), False)
+
+        for distance in [0, 4, '1', True]:
+            with self.assertRaises(ImproperlyConfigured):
+                Checker({'control_type': 'prohibited',
+                         'prohibited': [('near', distance, 'admin')]})
+        with self.assertRaises(ImproperlyConfigured):
+            Checker({'control_type': 'prohibited',
+                     'prohibited': [('near', 2, 'ab')]})
+        with self.assertRaises(ImproperlyConfigured):
+            Checker({'control_type': 'prohibited',
+                     'prohibited': [('near', 1, None)]})
+
+    def test_contains(self):
+        root = {
+            'control_type': 'prohibited',
+            'prohibited': [
+                ('contains', '', 'bad'),
+                ('contains', 'i', 'Word'),
+                ('contains', '', 'he'),
+                ('contains', '', 'she'),
+                ('contains', '', 'hers'),
+                ('contains', 'i', 'BADWORD'),
+            ],
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("xxbadxx"), False)
+        self.assertEqual(c.check("xxBADxx"), True)
+        self.assertEqual(c.check("myWORDS"), False)
+        self.assertEqual(c.check("ushers"), False)
+        self.assertEqual(c.check("hxsxe"), True)
+        self.assertEqual(c.explain("ushe")['rule_index'], 3)
+        self.assertEqual(c.explain("sh")['rule_index'], None)
+        self.assertEqual(c.explain("ushe")['list_name'], 'prohibited')
+        self.assertEqual([r['matched'] for r in c.explain("BADWORD")['rules']],
+                         [False, True, False, False, False, True])
+
+        c.add_prohibited(('contains', '', 'xyz'))
+        self.assertEqual(c.check("axyzb"), False)
+        c.remove_rule('prohibited', 0)
+        self.assertEqual(c.check("xxbadxx"), True)
+
+        c = Checker({'control_type': 'prohibited',
+                     'canonical': ['prohibited'],
+                     'prohibited': [('contains', '', 'admin')]})
+        self.assertEqual(c.check(u"theАDMINs"), False)
+
+        for element in [('contains', 'x', 'a'), ('contains', 'i', ''),
+                        ('contains', 'i', None)]:
+            with self.assertRaises(ImproperlyConfigured):
+                Checker({'control_type': 'prohibited',
+                         'prohibited': [element]})
+
+    def test_canonical(self):
+        root = {
+            'control_type': 'allowed_and_prohibited',
+            'canonical': ['prohibited'],
+            'allowed': ['Admin', ('re', '', '.*')],
+            'prohibited': ['Admin', ('re', '', 'root')],
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.check("ADMIN"), False)
+        self.assertEqual(c.check(u"аdmin"), False)  # Cyrillic 'а'.
+        self.assertEqual(c.check(u"ＡＤＭＩＮ"), False)
+        self.assertEqual(c.check("administrator"), True)
+        self.assertEqual(c.check("ROOT"), True)
+        self.assertEqual(list(c.check_many([u"аdmin"])),
+                         [(u"аdmin", False, 'Admin')])
+
+        with self.assertRaises(ImproperlyConfigured) as e:
+            Checker({'control_type': 'disabled', 'canonical': 'prohibited'})
+        self.assertEqual(
+            e.exception.message,
+            "The value of 'canonical' must be a sequence of list names: "
+            "'allowed' and/or 'prohibited'. 'prohibited' given.")
+
+        # Not ASCII byte strings.
+        name = u'имя'.encode('utf-8')
+        for element in [name, ('contains', '', name), ('near', 1, name)]:
+            with self.assertRaises(ImproperlyConfigured):
+                Checker(dict(root, prohibited=[element]))
+            with self.assertRaises(ImproperlyConfigured):
+                c.add_prohibited(element)
+        self.assertEqual(c.check("admin"), False)
+
+    def test_cache(self):
+        root = {
+            'control_type': 'prohibited',
+            'cache_size': 2,
+            'prohibited': ['admin', ('re', '', 'root')],
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.check("user"), True)
+        self.assertEqual(c.check("rooted"), False)  # Evicts 'admin'.
+        self.assertEqual(c.check("user"), True)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.cache_info(), (2, 4, 2, 2, 2))
+
+        self.assertEqual(Checker({'control_type': 'disabled'}).cache_info(),
+                         None)
+
+        with self.assertRaises(ImproperlyConfigured) as e:
+            Checker({'control_type': 'disabled', 'cache_size': -1})
+        self.assertEqual(
+            e.exception.message,
+            "The value of 'cache_size' must be a non-negative integer. "
+            "'-1' given.")
+
+    def test_instrument(self):
+        root = {
+            'control_type': 'allowed_and_prohibited',
+            'instrument': True,
+            'allowed': [('re', '', 'user'), 'admin'],
+            'prohibited': ['root', ('re', '', 'user_')],
+        }
+        c = Checker(root)
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append((kwargs['username'], kwargs['allowed'],
+                             kwargs['list_name'], kwargs['rule_index']))
+        name_checked.connect(receiver)
+        self.addCleanup(name_checked.disconnect, receiver)
+
+        self.assertEqual(c.check("user1"), True)
+        self.assertEqual(c.check("user_1"), False)
+        self.assertEqual(c.check("admin"), True)
+        self.assertEqual(c.check("root"), False)
+        self.assertEqual(received, [
+            ("user1", True, 'allowed', 0),
+            ("user_1", False, 'prohibited', 1),
+            ("admin", True, 'allowed', 1),
+            ("root", False, 'allowed', None),
+        ])
+
+        stats = c.stats()
+        self.assertEqual(stats['checks'], 4)
+        self.assertEqual(stats['rules'], {
+            ('allowed', 0): 1,
+            ('allowed', 1): 1,
+            ('prohibited', 1): 1,
+        })
+
+        self.assertEqual(Checker({'control_type': 'disabled'}).stats(), None)
+
+    def test_instrument_text_files(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u"staff\nroot\n")
+
+        c = Checker({
+            'control_type': 'prohibited',
+            'instrument': True,
+            'prohibited': ['admin', ('file', text_path), 'root'],
+        })
+        # Rules are found by the names loaded with the list.
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u"xyz\nadmin\n")
+        for name in ["xyz", "staff", "root", "admin"]:
+            c.check(name)
+        os.remove(text_path)
+        self.assertEqual(c.check("staff"), False)
+        self.assertEqual(c.stats()['rules'], {
+            ('prohibited', 0): 1,
+            ('prohibited', 1): 3,
+        })
+
+    def test_explain(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u"staff\n")
+
+        root = {
+            'control_type': 'allowed_and_prohibited',
+            'allowed': [('re', '', '.*')],
+            'prohibited': [
+                'root',
+                ('re', 'i', 'admin.*'),
+                ('re', '', '[a-z]+[0-9]'),
+                ('file', text_path),
+            ],
+        }
+        c = Checker(root)
+
+        e = c.explain("Admin1")
+        self.assertEqual(e['allowed'], False)
+        self.assertEqual(e['list_name'], 'prohibited')
+        self.assertEqual(e['rule_index'], 1)
+        self.assertEqual(e['rule'], ('re', 'i', 'admin.*'))
+        self.assertEqual(
+            [(r['list_name'], r['rule_index'], r['matched'])
+             for r in e['rules']],
+            [('allowed', 0, True), ('prohibited', 0, False),
+             ('prohibited', 1, True), ('prohibited', 2, False),
+             ('prohibited', 3, False)])
+
+        e = c.explain("staff")
+        self.assertEqual((e['allowed'], e['rule_index']), (False, 3))
+        self.assertEqual([r['matched'] for r in e['rules']],
+                         [True, False, False, False, True])
+
+        e = c.explain("user")
+        self.assertEqual((e['allowed'], e['list_name'], e['rule_index']),
+                         (True, 'allowed', 0))
+
+    def test_regexp_safety(self):
+        unsafe = [r'(a+)+$', r'(\w*\s?)*x', r'(?:ab|(c{1,20})){2,}']
+        safe = [r'a+b+', r'(ab)+', r'(a{1,5}){1,5}', r'(?:x|y)*z']
+
+        for pattern in unsafe:
+            with self.assertRaises(ImproperlyConfigured) as e:
+                Checker({
+                    'control_type': 'prohibited',
+                    'regexp_safety': 'raise',
+                    'prohibited': ['name', ('re', '', pattern)],
+                })
+            self.assertEqual(
+                e.exception.message,
+                "Regexp in 'prohibited' on position 1 has nested quantifiers "
+                "and may take exponential time to match: '{}'.".format(
+                    pattern))
+
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                Checker({
+                    'control_type': 'prohibited',
+                    'regexp_safety': 'warn',
+                    'prohibited': [('re', '', pattern)],
+                })
+            self.assertEqual(len(w), 1)
+
+            # No analysis by default.
+            Checker({'control_type': 'prohibited',
+                     'prohibited': [('re', '', pattern)]})
+
+        for pattern in safe:
+            Checker({
+                'control_type': 'prohibited',
+                'regexp_safety': 'raise',
+                'prohibited': [('re', '', pattern)],
+            })
+
+    def test_max_length(self):
+        root = {
+            'control_type': 'prohibited',
+            'max_length': 5,
+            'prohibited': [('re', '', 'x')],
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("abcde"), True)
+        self.assertEqual(c.check("abcdef"), False)
+        self.assertEqual(c.check("x"), False)
+        self.assertEqual(list(c.check_many(["abcdef"])),
+                         [("abcdef", False, None)])
+        self.assertEqual(c.explain("abcdef")['rules'], [])
+
+        c = Checker({'control_type': 'disabled', 'max_length': 5})
+        self.assertEqual(c.check("abcdef"), True)
+
+    def test_apply_diff(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u'root\nadmin\n')
+
+        root = {
+            'control_type': 'prohibited',
+            'cache_size': 10,
+            'prohibited': [
+                'admin',
+                ('re', '', 'staff.*'),
+                ('file', text_path),
+            ],
+        }
+        c = Checker(root)
+        self.assertEqual(c.check("user"), True)
+        self.assertEqual(c.check("root"), False)
+
+        c.add_prohibited('user', ('re', 'i', 'mod[0-9]+'), ('re', '', 'x.*'))
+        self.assertEqual(c.cache_info().size, 0)
+        self.assertEqual(c.check("user"), False)
+        self.assertEqual(c.check("MOD1"), False)
+        self.assertEqual(c.check("xyz"), False)
+        self.assertEqual(c.explain("xyz")['rule_index'], 5)
+
+        # Still in the text file.
+        c.remove_rule('prohibited', 0)
+        self.assertEqual(c.check("admin"), False)
+        self.assertEqual(c.explain("admin")['rule_index'], 2)
+
+        c.apply_diff(removed={'prohibited': [1, 2]})
+        self.assertEqual(c.check("admin"), True)
+        self.assertEqual(c.check("root"), True)
+        self.assertEqual(c.check("staff1"), True)
+        self.assertEqual(c.check("user"), False)
+        self.assertEqual(c.explain("xyz")['rule_index'], 5)
+        self.assertEqual(len(c.explain("xyz")['rules']), 3)
+        # The configuration isn't changed.
+        self.assertEqual(len(root['prohibited']), 3)
+
+        with self.assertRaises(ImproperlyConfigured):
+            c.add_prohibited(('re', 'z', 'a'))
+        with self.assertRaises(ValueError):
+            c.add_allowed('admin')
+        with self.assertRaises(IndexError):
+            c.remove_rule('prohibited', 6)
+
+        # Names loaded from a text file are removed even if it's changed
+        # or removed since.
+        c = Checker({
+            'control_type': 'prohibited',
+            'prohibited': ['root', ('file', text_path), ('file', text_path)],
+        })
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u'staff\n')
+        c.remove_rule('prohibited', 1)
+        self.assertEqual(c.check("admin"), False)
+        os.remove(text_path)
+        c.apply_diff(removed={'prohibited': [2]})
+        self.assertEqual(c.check("admin"), True)
+        self.assertEqual(c.check("staff"), True)
+        self.assertEqual(c.check("root"), False)
+
+        c = Checker({
+            'control_type': 'prohibited',
+            'canonical': ['prohibited'],
+            'prohibited': ['Admin', 'admin'],
+        })
+        c.remove_rule('prohibited', 0)
+        self.assertEqual(c.check(u"АDMIN"), False)
+        c.remove_rule('prohibited', 1)
+        self.assertEqual(c.check(u"АDMIN"), True)
+
+    def test_shared_index(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u'root\n')
+
+        root = {
+            'control_type': 'prohibited',
+            'shared_index': tmp_dir,
+            'canonical': ['prohibited'],
+            'prohibited': ['admin', u'имя', ('file', text_path),
+                           ('re', '', 'x.*')],
+        }
+        c = Checker(root)
+        files = [f for f in os.listdir(tmp_dir) if f.endswith('.bin')]
+        self.assertEqual(len(files), 1)
+        # Another process attaches to the same file.
+        Checker(root)
+        self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+        for name in ["ADMIN", u"имя", "root", "xyz"]:
+            self.assertEqual(c.check(name), False, name)
+        self.assertEqual(c.check("user"), True)
+        self.assertEqual(list(c.check_many(["Admin", "user"])),
+                         [("Admin", False, "admin"), ("user", True, None)])
+        self.assertEqual(c.explain("root")['rule_index'], 2)
+
+        c.add_prohibited('user')
+        self.assertEqual(c.check("user"), False)
+        c.remove_rule('prohibited', 0)
+        self.assertEqual(c.check("admin"), True)
+        self.assertEqual(c.check("root"), False)
+        self.assertEqual(
+            len([f for f in os.listdir(tmp_dir) if f.endswith('.bin')]), 1)
+
+        # The file written for the changed text file replaces the older one.
+        os.utime(os.path.join(tmp_dir, files[0]), (0, 0))
+        with io.open(text_path, 'a', encoding='utf-8') as f:
+            f.write(u'staff\n')
+        self.assertEqual(Checker(root).check("staff"), False)
+        self.assertEqual(c.check("root"), False)
+        new_files = [f for f in os.listdir(tmp_dir) if f.endswith('.bin')]
+        self.assertEqual(len(new_files), 1)
+        self.assertNotEqual(new_files, files)
+        self.assertTrue(new_files[0].startswith('text-'))
+
+        # The file removed (as an older one by another process) after it's
+        # found but before it's mapped is written again with the names of the
+        # text file.
+        os.remove(os.path.join(tmp_dir, new_files[0]))
+        exists = os.path.exists
+        os.path.exists = lambda path: path.endswith('.bin') or exists(path)
+        try:
+            c = Checker(root)
+        finally:
+            os.path.exists = exists
+        self.assertEqual(
+            [f for f in os.listdir(tmp_dir) if f.endswith('.bin')], new_files)
+        for name in ["root", "staff"]:
+            self.assertEqual(c.check(name), False, name)
+
+        # A truncated file.
+        with open(os.path.join(tmp_dir, new_files[0]), 'wb') as f:
+            f.write(b'RG')
+        with self.assertRaises(ImproperlyConfigured):
+            Checker(root)
+
+        root['shared_index'] = os.path.join(tmp_dir, 'missing')
+        with self.assertRaises(ImproperlyConfigured):
+            Checker(root)
+
+    def test_snapshot(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        sorted_path = os.path.join(tmp_dir, 'names.bin')
+        text_path = os.path.join(tmp_dir, 'names.txt')
+        snapshot_path = os.path.join(tmp_dir, 'snapshot')
+        namefiles.write_sorted_names([u'root'], sorted_path)
+        with io.open(text_path, 'w', encoding='utf-8') as f:
+            f.write(u'nobody\n')
+
+        root = {
+            'control_type': 'allowed_and_prohibited',
+            'cache_size': 10,
+            'instrument': True,
+            'canonical': ['prohibited'],
+            'allowed': [('re', '', '.*')],
+            'prohibited': [
+                'Admin',
+                ('re', 'i', 'staff.*'),
+                ('re', '', '[a-z]+[0-9]'),
+                ('re', '', 'x+y'),
+                ('file', sorted_path),
+                ['file', text_path],
+            ],
+        }
+        c = Checker(root)
+        c.check("admin")
+
+        snapshots.save_snapshot(c, root, snapshot_path)
+        loaded = snapshots.load_snapshot(root, snapshot_path)
+        for name in ["admin", u"АDMIN", "Staff1", "user1", "xxy", "root",
+                     "nobody", "user"]:
+            self.assertEqual(loaded.check(name), c.check(name))
+        self.assertEqual(loaded.cache_info().max_size, 10)
+        self.assertEqual(loaded.stats()['checks'], 8)
+        # A prefix and a regexp.
+        self.assertEqual(loaded.explain("Staff1")['rule_index'], 1)
+        self.assertEqual(loaded.explain("user1")['rule_index'], 2)
+
+        # The names files have changed.
+        with io.open(text_path, 'a', encoding='utf-8') as f:
+            f.write(u'user\n')
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            self.assertEqual(snapshots.load_snapshot(root, snapshot_path),
+                             None)
+        self.assertEqual(len(w), 1)
+        snapshots.save_snapshot(c, root, snapshot_path)
+        namefiles.write_sorted_names([u'root', u'user'], sorted_path)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            self.assertEqual(snapshots.load_snapshot(root, snapshot_path),
+                             None)
+        self.assertEqual(len(w), 1)
+
+        # Another configuration.
+        root['prohibited'] = []
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            self.assertEqual(snapshots.load_snapshot(root, snapshot_path),
+                             None)
+        self.assertEqual(len(w), 1)
+
+    def test_snapshot_url_names(self):
+        from registration_names.backends import utils
+        self.addCleanup(setattr, utils, '_url_names', None)
+        root = {'control_type': 'prohibited', 'prohibited': ['admin'],
+                'prohibit_urls': True}
+        utils._url_names = ['login']
+        old = snapshots.fingerprint(root)
+        self.assertEqual(snapshots.fingerprint(root), old)
+        utils._url_names = ['login', 'logout']
+        self.assertNotEqual(snapshots.fingerprint(root), old)
+
+
+class _CountingSource(object):
+    """
+    The source of checkers which prohibit both 'a' and 'b' in even versions
+    and neither in odd ones.
+    """
+
+    def __init__(self):
+        self.current = 0
+
+    def version(self):
+        return self.current
+
+    def load(self):
+        names = ['a', 'b'] if self.current % 2 == 0 else []
+        # Make the build slow enough to overlap with checks.
+        names.extend('name{}'.format(i) for i in range(2000))
+        return Checker({'control_type': 'prohibited', 'prohibited': names})
+
+
+class HolderTests(TestCase):
+
+    def test_reload_under_load(self):
+        source = _CountingSource()
+        holder = holders.CheckerHolder(source)
+        errors = []
+        done = threading.Event()
+
+        def check():
+            while not done.is_set():
+                checker = holder.get()
+                if checker.check('a') != checker.check('b'):
+                    errors.append(checker)
+
+        threads = [threading.Thread(target=check) for _ in range(8)]
+        for t in threads:
+            t.start()
+        try:
+            for _ in range(30):
+                source.current += 1
+                holder.reload()
+        finally:
+            done.set()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(holder.get().check('a'), False)
+
+    def test_reloader(self):
+        source = _CountingSource()
+        holder = holders.CheckerHolder(source)
+        holder.start_reloader(interval=0.01)
+        self.addCleanup(holder.stop_reloader)
+        self.assertEqual(holder.check('a'), False)
+
+        source.current += 1
+        for _ in range(500):
+            if holder.check('a'):
+                break
+            time.sleep(0.01)
+        self.assertEqual(holder.check('a'), True)
+
+    def test_reloader_after_fork(self):
+        if not hasattr(os, 'fork'):
+            self.skipTest("fork() isn't available.")
+        source = _CountingSource()
+        holder = holders.CheckerHolder(source)
+        holder.start_reloader(interval=0.01)
+        self.addCleanup(holder.stop_reloader)
+
+        pid = os.fork()
+        if pid == 0:
+            # The reloader of the parent doesn't exist in the child.
+            code = 1
+            try:
+                holder.check('a')
+                source.current += 1
+                for _ in range(500):
+                    if holder.check('a'):
+                        code = 0
+                        break
+                    time.sleep(0.01)
+            finally:
+                os._exit(code)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+    def test_file_source(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'names.json')
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(u'{"control_type": "prohibited", "prohibited": ["a"]}')
+
+        holder = holders.CheckerHolder(holders.FileSource(path))
+        self.assertEqual(holder.check('a'), False)
+        checker = holder.get()
+        self.assertIs(holder.get(), checker)
+
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(u'{"control_type": "prohibited", "prohibited": ["bb"]}')
+        self.assertEqual(holder.check('a'), True)
+        self.assertEqual(holder.check('bb'), False)
+
+
+class _ExistingUsersForm(object):
+    """
+    Stands for a registration form which queries the database in
+    `clean_username`.
+    """
+
+    queries = 0
+
+    def __init__(self, username):
+        self.cleaned_data = {'username': username}
+
+    def clean_username(self):
+        _ExistingUsersForm.queries += 1
+        return self.cleaned_data['username']
+
+
+class FormTests(TestCase):
+
+    def test_rules_before_query(self):
+        class Form(forms.NameControlMixin, _ExistingUsersForm):
+            checker_holder = holders.CheckerHolder(_CountingSource())
+
+        forms.query_stats.reset()
+        _ExistingUsersForm.queries = 0
+
+        self.assertEqual(Form('user').clean_username(), 'user')
+        with self.assertRaises(ValidationError):
+            Form('a').clean_username()
+        self.assertEqual(_ExistingUsersForm.queries, 1)
+        self.assertEqual(forms.query_stats.as_dict(), {
+            'checks': 2,
+            'queries': 1,
+            'queries_avoided': 1,
+        })
+
+
+class DatabaseTests(django_test.TestCase):
+
+    def setUp(self):
+        # Need the database.
+        from registration_names import store
+        from registration_names.models import ReservedName
+        self.store = store
+        self.ReservedName = ReservedName
+        store.cache.delete(store.VERSION_CACHE_KEY)
+
+    def test_reserved_name(self):
+        rule = self.ReservedName(list_name='prohibited', pattern=u'админ')
+        self.assertEqual(rule.as_element(), u'админ')
+        self.assertEqual(u'{}'.format(rule), u'админ')
+        str(rule)
+        rule.clean()
+
+        rule = self.ReservedName(list_name='prohibited', kind='re',
+                                 pattern='adm[in', flags='i')
+        self.assertEqual(rule.as_element(), ('re', 'i', 'adm[in'))
+        with self.assertRaises(ValidationError):
+            rule.clean()
+
+    def test_load_root(self):
+        self.ReservedName.objects.create(list_name='prohibited',
+                                         pattern='admin')
+        self.ReservedName.objects.create(list_name='prohibited', kind='re',
+                                         pattern='^staff', flags='i')
+        self.ReservedName.objects.create(list_name='allowed',
+                                         pattern='user')
+        root = {'control_type': 'prohibited', 'database': True,
+                'prohibited': ('root',)}
+        loaded = self.store.load_root(root)
+        self.assertEqual(loaded['prohibited'],
+                         ['root', 'admin', ('re', 'i', '^staff')])
+        self.assertEqual(loaded['allowed'], ['user'])
+        self.assertEqual(root['prohibited'], ('root',))
+
+        checker = Checker(loaded)
+        for name in ['root', 'admin', 'Staff1']:
+            self.assertEqual(checker.check(name), False)
+        self.assertEqual(checker.check('user'), True)
+
+
+class DatabaseTransactionTests(django_test.TransactionTestCase):
+    """
+    Versions are bumped on commit, which `django_test.TestCase` never does.
+    """
+
+    def setUp(self):
+        # Need the database.
+        from django.core.signals import request_finished
+        from django.db import transaction
+        from registration_names import store
+        from registration_names.models import ReservedName
+        self.store = store
+        self.ReservedName = ReservedName
+        # Django < 1.6.
+        self.atomic = getattr(transaction, 'atomic',
+                              getattr(transaction, 'commit_on_success', None))
+        # Ends the request of an admin view.
+        self.finish_request = lambda: request_finished.send(sender=None)
+        store.cache.delete(store.VERSION_CACHE_KEY)
+
+    def test_version(self):
+        version = self.store.get_version()
+        self.assertEqual(self.store.get_version(), version)
+
+        rule = self.ReservedName.objects.create(list_name='prohibited',
+                                                pattern='admin')
+        self.assertNotEqual(self.store.get_version(), version)
+        version = self.store.get_version()
+        rule.delete()
+        self.assertNotEqual(self.store.get_version(), version)
+
+    def test_reload_during_save(self):
+        root = {'control_type': 'prohibited', 'database': True,
+                'prohibited': []}
+        holder = holders.CheckerHolder(holders.DatabaseSource(root))
+        old_checker = holder.get()
+        self.assertEqual(old_checker.check('admin'), True)
+
+        with self.atomic():
+            self.ReservedName.objects.create(list_name='prohibited',
+                                             pattern='admin')
+            # Another process reloads the rules before the commit and reads
+            # the old ones.
+            holder.set(old_checker)
+        self.finish_request()
+
+        self.assertEqual(holder.check('admin'), False)
+
+
+class ViewTests(django_test.TestCase):
+
+    def setUp(self):
+        # Need the database.
+        from django.core.cache import cache
+        from registration_names import views
+        self.views = views
+        cache.clear()
+        self.factory = RequestFactory()
+        self.settings = override_settings(
+            REGISTRATION_NAMES={'control_type': 'prohibited',
+                                'prohibited': ['admin']},
+            REGISTRATION_NAMES_SITES={
+                'shop.example.com': {'control_type': 'prohibited',
+                                     'prohibited': ['cart']},
+            })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def check(self, username, host='example.com', **kwargs):
+        request = self.factory.get('/', {'username': username},
+                                   HTTP_HOST=host)
+        response = self.views.check_username(request, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_check(self):
+        from django.contrib.auth.models import User
+        User.objects.create(username='taken')
+
+        self.assertEqual(self.check('user'), {
+            'username': 'user', 'allowed': True, 'reason': None})
+        self.assertEqual(self.check('admin'), {
+            'username': 'admin', 'allowed': False, 'reason': 'not_allowed'})
+        self.assertEqual(self.check('Taken'), {
+            'username': 'Taken', 'allowed': False, 'reason': 'exists'})
+        self.assertEqual(self.check('Taken', check_existence=False),
+                         {'username': 'Taken', 'allowed': True,
+                          'reason': None})
+
+    def test_bad_requests(self):
+        for params in [{}, {'username': ''}, {'username': 'a' * 31},
+                       {'username': 'a b'}, {'username': u'a\u0000'}]:
+            response = self.views.check_username(
+                self.factory.get('/', params))
+            self.assertEqual(response.status_code, 400, params)
+        response = self.views.check_username(
+            self.factory.post('/', {'username': 'user'}))
+        self.assertEqual(response.status_code, 405)
+
+    def test_sites(self):
+        self.assertEqual(self.check('cart')['allowed'], True)
+        self.assertEqual(self.check('cart', 'shop.example.com')['allowed'],
+                         False)
+        self.assertEqual(self.check('admin', 'shop.example.com')['allowed'],
+                         False)
+
+    def test_cache(self):
+        from django.contrib.auth.models import User
+        self.assertEqual(self.check('user')['allowed'], True)
+        User.objects.create(username='user')
+        self.assertEqual(self.check('user')['allowed'], True)
+        self.assertEqual(self.check('user', cache_timeout=0)['allowed'],
+                         False)
+        # Results of sites are cached separately.
+        self.assertEqual(self.check('user', 'shop.example.com')['allowed'],
+                         False)
+
+
+class SnapshotCommandTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'snapshot')
+        self.root = {'control_type': 'prohibited', 'prohibited': ['admin']}
+        self.settings = override_settings(
+            REGISTRATION_NAMES=self.root,
+            REGISTRATION_NAMES_SNAPSHOT=self.path)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_command(self):
+        stdout = six.StringIO()
+        call_command('build_registration_names_snapshot', stdout=stdout)
+        output = stdout.getvalue()
+        self.assertTrue(output.startswith(
+            "Snapshot saved to '{}' in ".format(self.path)), output)
+        self.assertTrue(output.endswith(" s.\n"), output)
+        loaded = snapshots.load_snapshot(self.root, self.path)
+        self.assertEqual(loaded.check('admin'), False)
+        self.assertEqual(loaded.check('user'), True)
+
+        other_path = os.path.join(self.tmp_dir, 'other')
+        call_command('build_registration_names_snapshot', other_path,
+                     stdout=stdout)
+        self.assertIsNot(snapshots.load_snapshot(self.root, other_path),
+                         None)
+
+        with override_settings(REGISTRATION_NAMES_SNAPSHOT=None):
+            # Django < 1.5 exits.
+            with self.assertRaises((CommandError, SystemExit)):
+                call_command('build_registration_names_snapshot',
+                             stdout=stdout, stderr=six.StringIO())
+
+    def test_settings_source(self):
+        # The snapshot of another checker made for the setting.
+        snapshots.save_snapshot(
+            Checker({'control_type': 'prohibited', 'prohibited': ['user']}),
+            self.root, self.path)
+        holder = holders.CheckerHolder(holders.SettingsSource())
+        self.assertEqual(holder.check('user'), False)
+        self.assertEqual(holder.check('admin'), True)
+
+        # The snapshot isn't used for another configuration.
+        root = dict(self.root, prohibited=['admin', 'root'])
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            with override_settings(REGISTRATION_NAMES=root):
+                self.assertEqual(holder.check('user'), True)
+                self.assertEqual(holder.check('root'), False)
+        self.assertEqual(len(w), 1)
+
+        # Nor when it can't be loaded.
+        with io.open(self.path, 'wb') as f:
+            f.write(b'x')
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            holder.reload(force=True)
+            self.assertEqual(holder.check('user'), True)
+            self.assertEqual(holder.check('admin'), False)
+        self.assertEqual(len(w), 1)
+
+
+class ProfileCommandTests(TestCase):
+
+    def test_file(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'names.txt')
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(u'admin\n\n{}\nuser\nstaff\n'.format('a' * 20))
+
+        stdout = six.StringIO()
+        with override_settings(REGISTRATION_NAMES={
+                'control_type': 'prohibited',
+                # Backtracks heavily on the long name.
+                'prohibited': ['admin', ('re', '', '(a|aa)+c')],
+        }):
+            call_command('profile_registration_names', file=path, sample=3,
+                         top=1, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        # Empty lines are skipped, the last name isn't in the sample.
+        self.assertEqual(lines[0], "Checked 3 usernames.")
+        self.assertEqual(lines[1].split(), ["total,", "us", "max,", "us",
+                                            "matches", "rule"])
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(re.match(
+            r"^ +\d+\.\d +\d+\.\d +0  prohibited\[1\]: "
+            r"\(u?'re', u?'', u?'\(a\|aa\)\+c'\)$", lines[2]), lines[2])
+
+
+class AuditTests(django_test.TestCase):
+
+    def setUp(self):
+        # Need the database.
+        from django.contrib.auth.models import User
+        for username in ['admin', 'user', 'Staff1', u'имя']:
+            User.objects.create(username=username)
+        self.settings = override_settings(REGISTRATION_NAMES={
+            'control_type': 'prohibited',
+            'prohibited': ['admin', ('re', 'i', 'staff.*'), u'имя'],
+        })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def audit(self, **options):
+        path = os.path.join(self.tmp_dir, 'audit')
+        stderr = six.StringIO()
+        call_command('audit_registration_names', output=path, stderr=stderr,
+                     progress_every=2, chunk_size=2, **options)
+        self.assertIn("Checked 4 usernames, 3 not allowed.\n",
+                      stderr.getvalue())
+        with io.open(path, encoding='utf-8', newline='') as f:
+            return sorted(f.read().splitlines())
+
+    def test_csv(self):
+        self.assertEqual(self.audit(workers=1), [
+            u'Staff1,"[""re"", ""i"", ""staff.*""]"',
+            u'admin,admin',
+            u'имя,имя',
+        ])
+
+    def test_jsonl(self):
+        expected = [
+            {'username': 'Staff1', 'rule': ['re', 'i', 'staff.*']},
+            {'username': 'admin', 'rule': 'admin'},
+            {'username': u'имя', 'rule': u'имя'},
+        ]
+        for workers in [1, 2]:
+            lines = self.audit(workers=workers, format='jsonl')
+            self.assertEqual(
+                sorted((json.loads(line) for line in lines),
+                       key=lambda r: r['username']),
+                expected)
+
+    def test_chunks(self):
+        from registration_names.management.commands import (
+            audit_registration_names)
+        # Paged by primary keys, one query per chunk and the last empty one.
+        with self.assertNumQueries(3):
+            chunks = list(audit_registration_names._username_chunks(3))
+        self.assertEqual(chunks, [['admin', 'user', 'Staff1'], [u'имя']])
+
+
+def _view(request):
+    pass
+
+
+# The root URLconf of `URLNamesTests.test_url_names`.
+urlpatterns = [
+    url(r'^$', _view),
+    url(r'^login/$', _view),
+    url(r'^robots\.txt$', _view),
+    url(r'^settings/', _view),
+    url(r'^(?P<username>\w+)/$', _view),
+]
+
+
+class URLNamesTests(TestCase):
+
+    def test_first_segments(self):
+        patterns = [
+            RegexURLPattern(r'^$', None),
+            RegexURLPattern(r'^login/$', None),
+            RegexURLPattern(r'^robots\.txt$', None),
+            RegexURLPattern(r'^(?P<username>\w+)/$', None),
+            RegexURLPattern(r'^api\d/', None),
+            RegexURLPattern(r'logout/$', None),
+            RegexURLResolver(r'^accounts/', [RegexURLPattern(r'^x/$', None)]),
+            RegexURLResolver(r'^', [
+                RegexURLPattern(r'^settings/', None),
+                RegexURLResolver(r'', [RegexURLPattern(r'^api$', None)]),
+            ]),
+        ]
+        self.assertEqual(
+            backends_utils.url_first_segments(patterns),
+            ['login', 'robots.txt', 'accounts', 'settings', 'api'])
+
+        root = {'control_type': 'prohibited', 'prohibited': ('admin',)}
+        backends_utils._url_names = ['login', 'api']
+        self.addCleanup(setattr, backends_utils, '_url_names', None)
+        self.assertEqual(backends_utils.add_url_names(root)['prohibited'],
+                         ['admin', 'login', 'api'])
+        self.assertEqual(root['prohibited'], ('admin',))
+
+        for control_type in ['allowed', 'disabled']:
+            with self.assertRaises(ImproperlyConfigured):
+                backends_utils.add_url_names(
+                    {'control_type': control_type, 'allowed': ['x'],
+                     'prohibit_urls': True})
+
+    def test_url_names(self):
+        # The URLconf of this module.
+        with override_settings(ROOT_URLCONF=__name__):
+            self.assertEqual(backends_utils.get_url_names(),
+                             ['login', 'robots.txt', 'settings'])
+            root = {'control_type': 'prohibited', 'prohibited': ['admin'],
+                    'prohibit_urls': True}
+            checker = Checker(holders.prepare_root(root))
+            self.assertEqual(checker.check('settings'), False)
+            self.assertEqual(checker.check('user'), True)
+        self.assertIs(backends_utils._url_names, None)
+
+
+class SitesTests(TestCase):
+
+    def test_pool(self):
+        pool = sites.CheckerPool(2)
+        roots = dict(
+            (key, {'control_type': 'prohibited', 'prohibited': [key]})
+            for key in ['a', 'b', 'c'])
+
+        checker = pool.get('a', roots['a'])
+        self.assertEqual(checker.check('a'), False)
+        self.assertIs(pool.get('a', roots['a']), checker)
+        pool.get('b', roots['b'])
+        pool.get('a', roots['a'])
+        pool.get('c', roots['c'])
+        self.assertEqual(len(pool), 2)
+        # 'b' is dropped as least recently used.
+        self.assertIs(pool.get('a', roots['a']), checker)
+
+        # Another configuration.
+        roots['a'] = dict(roots['a'])
+        self.assertIsNot(pool.get('a', roots['a']), checker)
+
+    def test_layered(self):
+        base = Checker({'control_type': 'prohibited',
+                        'prohibited': ['admin']})
+        site = Checker({'control_type': 'allowed',
+                        'allowed': [('re', '', '[a-z]+')]})
+        checker = sites.LayeredChecker([base, site])
+        self.assertEqual(checker.check('user'), True)
+        self.assertEqual(checker.check('admin'), False)
+        self.assertEqual(checker.check('User'), False)
+
+
+class SiteFormTests(django_test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.settings = override_settings(
+            REGISTRATION_NAMES={'control_type': 'prohibited',
+                                'prohibited': ['admin']},
+            REGISTRATION_NAMES_SITES={
+                'shop.example.com': {'control_type': 'prohibited',
+                                     'prohibited': ['cart']},
+            })
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_form_class(self):
+        form_class = forms.RegistrationNameControlForm
+        request = self.factory.get('/', HTTP_HOST='shop.example.com')
+        site_class = sites.get_form_class(form_class, request)
+        self.assertTrue(issubclass(site_class, form_class))
+        self.assertEqual(site_class.__name__, form_class.__name__)
+        self.assertEqual(site_class.__module__, form_class.__module__)
+        self.assertEqual(site_class.checker_holder.get().check('cart'), False)
+        self.assertEqual(site_class.checker_holder.get().check('admin'),
+                         False)
+        # Made once per site.
+        self.assertIs(sites.get_form_class(form_class, request), site_class)
+
+        request = self.factory.get('/', HTTP_HOST='other.example.com')
+        self.assertIs(sites.get_form_class(form_class, request), form_class)
+
+    def test_backends(self):
+        try:
+            from registration_names.backends.default import DefaultBackend
+            from registration_names.backends.simple import SimpleBackend
+        except ImportError:
+            self.skipTest("django-registration has no backend classes.")
+        request = self.factory.get('/', HTTP_HOST='shop.example.com')
+        for backend_class in [DefaultBackend, SimpleBackend]:
+            form_class = backend_class().get_form_class(request)
+            self.assertTrue(issubclass(form_class,
+                                       forms.RegistrationNameControlForm))
+            self.assertEqual(form_class.checker_holder.get().check('cart'),
+                             False)
+            request_other = self.factory.get('/', HTTP_HOST='example.org')
+            self.assertIs(backend_class().get_form_class(request_other),
+                          forms.RegistrationNameControlForm)
+
+    def test_site_key(self):
+        from django.conf import settings
+        if 'django.contrib.sites' not in settings.INSTALLED_APPS:
+            self.skipTest("django.contrib.sites isn't installed.")
+        from django.contrib.sites.models import Site
+        site = Site.objects.get_current()
+        request = self.factory.get('/', HTTP_HOST='shop.example.com')
+        self.assertEqual(sites.get_site_key(request), 'shop.example.com')
+
+        root = {'control_type': 'prohibited', 'prohibited': ['cart']}
+        for key in [site.id, site.domain]:
+            with override_settings(REGISTRATION_NAMES_SITES={key: root}):
+                self.assertEqual(sites.get_site_key(request), key)
+        with override_settings(REGISTRATION_NAMES_SITES={}):
+            self.assertEqual(sites.get_site_key(request), None)
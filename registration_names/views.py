@@ -0,0 +1,79 @@
+import hashlib
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.decorators.http import require_GET
+
+from registration.forms import RegistrationForm
+
+from registration_names.sites import get_site_checker, get_site_key
+
+
+CACHE_KEY_PREFIX = 'registration_names:check:'
+
+REASON_NOT_ALLOWED = 'not_allowed'
+REASON_EXISTS = 'exists'
+
+
+def _check(username, check_existence, site_key):
+    """
+    Return the tuple of the result of the check of `username` and the reason
+    why it isn't allowed (None for allowed usernames).
+    """
+    if not get_site_checker(site_key).check(username):
+        return False, REASON_NOT_ALLOWED
+    if check_existence and \
+            User.objects.filter(username__iexact=username).exists():
+        return False, REASON_EXISTS
+    return True, None
+
+
+@require_GET
+def check_username(request, check_existence=True, cache_timeout=10,
+                   form_class=RegistrationForm):
+    """
+    Check if the username passed in 'username' GET parameter is available for
+    registration.
+
+    Responds with JSON: {"username": ..., "allowed": ..., "reason": ...}
+    where "reason" is "not_allowed" for usernames not allowed by
+    `REGISTRATION_NAMES` and the rules of the site (see
+    `registration_names.sites`), "exists" for usernames already registered
+    and null for allowed ones.
+
+    `check_existence` - whether to check the username isn't registered yet.
+    `cache_timeout` - how long results are cached in seconds, so repeated
+    checks (e.g. while a user types) don't hit the database. 0 disables
+    caching.
+    `form_class` - the registration form whose 'username' field validates
+    the username (its length and charset) before it's checked. Responds with
+    400 for invalid usernames.
+    """
+    username = request.GET.get('username')
+    if not username:
+        return HttpResponseBadRequest("'username' parameter is required.")
+    try:
+        username = form_class.base_fields['username'].clean(username)
+    except ValidationError as e:
+        return HttpResponseBadRequest(u' '.join(e.messages))
+
+    site_key = get_site_key(request)
+    digest = hashlib.md5(
+        u'{}:{}'.format(site_key, username).encode('utf-8')).hexdigest()
+    key = '{}{}:{}'.format(CACHE_KEY_PREFIX, int(bool(check_existence)),
+                           digest)
+    result = cache.get(key) if cache_timeout else None
+    if result is None:
+        result = _check(username, check_existence, site_key)
+        if cache_timeout:
+            cache.set(key, result, cache_timeout)
+
+    allowed, reason = result
+    return HttpResponse(json.dumps({
+        'username': username,
+        'allowed': allowed,
+        'reason': reason,
+    }), content_type='application/json')